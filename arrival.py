@@ -0,0 +1,159 @@
+"""按到校时间自动判定早到：根据Setting.yml中的规则编译出(星期, session, 地点)阈值表
+
+默认规则来自班规：
+- 平时7:05前到教室算早到
+- 升旗日（默认星期一）7:00前到教室或升旗点都算早到
+- 星期天7:50前算早到
+- 下午以timer.afternoon为准
+"""
+import argparse
+import csv
+import sys
+from datetime import datetime
+
+from common import SESSIONS
+
+
+def parse_clock(text):
+    """把"7:05"或"7:05:30"解析为当天的秒数"""
+    try:
+        parts = [int(p) for p in str(text).strip().split(':')]
+    except ValueError:
+        raise ValueError(f"无法解析时间: {text}") from None
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"无法解析时间: {text}")
+    hour, minute = parts[0], parts[1]
+    second = parts[2] if len(parts) == 3 else 0
+    if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 60):
+        raise ValueError(f"无法解析时间: {text}")
+    return hour * 3600 + minute * 60 + second
+
+
+def default_rules(setting):
+    """没有配置arrival时使用的默认规则"""
+    afternoon = setting.get('timer', {}).get('afternoon', '13:05')
+    return [
+        {'session': 'morning', 'time': '7:05', 'locations': ['classroom']},
+        {'session': 'morning', 'weekday': [0], 'time': '7:00', 'locations': ['classroom', 'flag']},
+        {'session': 'morning', 'weekday': [6], 'time': '7:50', 'locations': ['classroom']},
+        {'session': 'afternoon', 'time': afternoon, 'locations': ['classroom']},
+    ]
+
+
+class ArrivalCalendar:
+    """编译后的早到阈值表
+
+    规则按顺序应用，后面的规则覆盖前面规则中相同(星期, session, 地点)的阈值。
+    表中没有的组合表示该地点在这个时段打卡不算早到。
+    """
+
+    def __init__(self, rules, noon='12:00'):
+        self.noon = parse_clock(noon)
+        self.table = {}
+        for rule in rules:
+            session = rule['session']
+            if session not in SESSIONS:
+                raise ValueError(f"未知的session: {session}")
+            threshold = parse_clock(rule['time'])
+            weekdays = rule.get('weekday', range(7))
+            if isinstance(weekdays, int):
+                weekdays = [weekdays]
+            for weekday in weekdays:
+                for location in rule.get('locations', ['classroom']):
+                    self.table[(weekday, session, location)] = threshold
+
+    @classmethod
+    def from_setting(cls, setting):
+        """从设置字典编译阈值表"""
+        arrival = setting.get('arrival') or {}
+        return cls(arrival.get('rules') or default_rules(setting), arrival.get('noon', '12:00'))
+
+    def classify(self, timestamp, location='classroom'):
+        """判定一次打卡，返回(日期, session, 是否早到)"""
+        timestamp = to_datetime(timestamp)
+        seconds = timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second
+        session = "morning" if seconds < self.noon else "afternoon"
+        threshold = self.table.get((timestamp.weekday(), session, location))
+        return timestamp.date(), session, threshold is not None and seconds < threshold
+
+    def classify_batch(self, timestamps, names, locations=None):
+        """批量判定打卡记录，返回{(日期, session): 早到的学生集合}
+
+        三个参数是等长的列，locations为None时全部视为教室打卡。
+        同一天同一地点的阈值只查一次表。
+        """
+        result = {}
+        thresholds = {}  # (日期, 地点) -> (上午阈值, 下午阈值)
+        noon = self.noon
+        table = self.table
+        if locations is None:
+            locations = ['classroom'] * len(names)
+
+        for timestamp, name, location in zip(timestamps, names, locations):
+            timestamp = to_datetime(timestamp)
+            day = timestamp.date()
+            key = (day, location)
+            pair = thresholds.get(key)
+            if pair is None:
+                weekday = day.weekday()
+                pair = thresholds[key] = (table.get((weekday, "morning", location)),
+                                          table.get((weekday, "afternoon", location)))
+            seconds = timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second
+            if seconds < noon:
+                session, threshold = "morning", pair[0]
+            else:
+                session, threshold = "afternoon", pair[1]
+            present = result.setdefault((day, session), set())
+            if threshold is not None and seconds < threshold:
+                present.add(name)
+        return result
+
+
+def to_datetime(value):
+    """把datetime、ISO字符串或Unix时间戳统一转换为本地datetime"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    return datetime.fromisoformat(str(value).strip())
+
+
+def record_arrivals(system, timestamps, names, locations=None, calendar=None):
+    """判定一批打卡记录并按日期顺序写入考勤系统
+
+    每个出现过打卡的(日期, session)都会记录一次，没有早到的学生视为未早到。
+    返回{(日期, session): 分数}。
+    """
+    calendar = calendar or ArrivalCalendar.from_setting(system.setting)
+    classified = calendar.classify_batch(timestamps, names, locations)
+    results = {}
+    for day, session in sorted(classified, key=lambda k: (k[0], SESSIONS.index(k[1]))):
+        results[(day, session)] = system.record_attendance(session, classified[(day, session)], day=day)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="根据打卡时间自动判定早到并记录考勤")
+    parser.add_argument('events', help="CSV文件，每行为: 时间戳,姓名[,地点]")
+    args = parser.parse_args(argv)
+
+    timestamps, names, locations = [], [], []
+    with open(args.events, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            try:
+                timestamp = to_datetime(row[0])
+            except (ValueError, IndexError):
+                continue  # 表头或格式错误的行
+            timestamps.append(timestamp)
+            names.append(row[1].strip())
+            locations.append(row[2].strip() if len(row) > 2 and row[2].strip() else 'classroom')
+
+    from core import AttendanceSystem
+
+    results = record_arrivals(AttendanceSystem(), timestamps, names, locations)
+    for (day, session), scores in results.items():
+        print(f"{day} {session}: 已记录{len(scores)}名学生的考勤")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""考勤窗口勾选状态的自动暂存
+
+勾选变化后不立即写文件：第一次变化后等delay秒再写，期间的变化合并成一次；
+同一个session两次写入之间至少隔interval秒，全班一起打勾时写入次数也有上限。
+写入时读取当前的勾选状态，与上次写入的相同时跳过。
+"""
+
+
+class BreakpointAutosaver:
+    """按session合并勾选变化，通过TkScheduler延迟写入暂存
+
+    任务不挂在考勤窗口上（修改定时设置时会按窗口取消任务），由这里自己取消。
+    """
+
+    def __init__(self, scheduler, save, delay=1, interval=5):
+        self.scheduler = scheduler
+        self.save = save          # save(session, 到场学生)
+        self.delay = delay
+        self.interval = interval
+        self.sources = {}         # session -> 返回当前勾选学生的函数
+        self.written = {}         # session -> 上次写入的学生
+        self.last_write = {}      # session -> 上次写入的时间
+        self.pending = {}         # session -> 定时任务的token
+
+    def watch(self, session, selected, initial=()):
+        """开始跟踪一个考勤窗口，selected()返回当前勾选的学生，initial是已暂存的学生"""
+        self.cancel(session)
+        self.sources[session] = selected
+        self.written[session] = frozenset(initial)
+
+    def changed(self, session):
+        """勾选有变化，已经安排了写入时不再重复安排"""
+        if session not in self.sources or session in self.pending:
+            return
+        due = self.scheduler.clock() + self.delay
+        last = self.last_write.get(session)
+        if last is not None:
+            due = max(due, last + self.interval)
+        self.pending[session] = self.scheduler.call_at(due, self.flush, session)
+
+    def flush(self, session):
+        """立即写入尚未保存的变化"""
+        token = self.pending.pop(session, None)
+        if token is not None:
+            self.scheduler.cancel(token)
+        selected = self.sources.get(session)
+        if selected is None:
+            return
+        present = selected()
+        if frozenset(present) == self.written[session]:
+            return
+        self.save(session, present)
+        self.mark_saved(session, present)
+
+    def mark_saved(self, session, present):
+        """暂存已经写入（例如手动暂存），取消尚未执行的写入"""
+        token = self.pending.pop(session, None)
+        if token is not None:
+            self.scheduler.cancel(token)
+        if session in self.sources:
+            self.written[session] = frozenset(present)
+            self.last_write[session] = self.scheduler.clock()
+
+    def cancel(self, session):
+        """停止跟踪并丢弃未写入的变化，例如考勤已经提交"""
+        token = self.pending.pop(session, None)
+        if token is not None:
+            self.scheduler.cancel(token)
+        self.sources.pop(session, None)
+        self.written.pop(session, None)
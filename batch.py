@@ -0,0 +1,241 @@
+"""无界面批量导入：按天流式重放历史签到记录，重新计算分数并生成报告
+
+用法：
+    python batch.py events.csv --weekly-reports
+    python batch.py events.jsonl --sessions morning,afternoon --report
+
+CSV需要包含date, session, name三列（可带表头），JSONL每行是
+{"date": ..., "session": ..., "name": ...}。记录必须按日期升序排列，
+同一天内的顺序不限。整个过程只在内存中保留当天的签到名单。
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from common import SESSIONS
+from core import AttendanceSystem
+from roster import RosterMatrix
+from term import TermHistory
+
+
+class BatchStats:
+    """导入统计"""
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0        # 格式错误被跳过的行
+        self.unknown = 0        # 名单里没有的学生
+        self.days = 0
+        self.reports = []
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'skipped': self.skipped,
+            'unknown': self.unknown,
+            'days': self.days,
+            'reports': [str(report) for report in self.reports],
+        }
+
+
+def _parse_date(text, cache):
+    """解析日期或日期时间字符串，只取日期部分"""
+    day = cache.get(text)
+    if day is None:
+        day = date.fromisoformat(text.strip()[:10])
+        if len(cache) > 4096:
+            cache.clear()
+        cache[text] = day
+    return day
+
+
+def read_events(path, fmt=None, stats=None):
+    """流式读取(日期, session, 姓名)事件，格式错误的行会被跳过并计数"""
+    path = Path(path)
+    fmt = fmt or ('jsonl' if path.suffix in ('.jsonl', '.json') else 'csv')
+    stats = stats or BatchStats()
+    cache = {}
+
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if fmt == 'jsonl':
+            rows = (line for line in f if line.strip())
+        else:
+            rows = csv.reader(f)
+
+        for row in rows:
+            stats.rows += 1
+            try:
+                if fmt == 'jsonl':
+                    event = json.loads(row)
+                    raw_date, session, name = event['date'], event['session'], event['name']
+                else:
+                    raw_date, session, name = row[0], row[1], row[2]
+                day = _parse_date(raw_date, cache)
+                session, name = session.strip(), name.strip()
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                # CSV表头、JSON中不是字符串的字段也会走到这里
+                stats.skipped += 1
+                continue
+            if session not in SESSIONS:
+                stats.skipped += 1
+                continue
+            yield day, session, name
+
+
+def group_by_day(events):
+    """把按日期排序的事件流按天分组，产出(日期, {session: 到场名单})"""
+    current = None
+    present = {}
+    for day, session, name in events:
+        if day != current:
+            if current is not None:
+                if day < current:
+                    raise ValueError(f"记录未按日期排序: {day} 出现在 {current} 之后")
+                yield current, present
+            current = day
+            present = {}
+        present.setdefault(session, set()).add(name)
+    if current is not None:
+        yield current, present
+
+
+class BatchImporter:
+    """把按天分组的签到记录批量送入整班考勤矩阵
+
+    fresh为True时从空白数据开始重新计算（规则调整后重算），
+    否则接着eggs/里已有的数据继续记录。
+    """
+
+    def __init__(self, system, sessions=None, weekly_reports=False, fresh=True, stats=None):
+        self.system = system
+        self.sessions = tuple(sessions) if sessions else None
+        self.weekly_reports = weekly_reports
+        self.stats = stats or BatchStats()
+        self.names = system.setting['namelist']
+        self.fresh = fresh
+        if fresh:
+            self.rosters = {session: RosterMatrix(self.names) for session in SESSIONS}
+        else:
+            self.rosters = {session: system.load_roster(session) for session in SESSIONS}
+        self.terms = {}   # session -> 写在临时文件里的整学期记录，全部成功后才替换
+        self.week = None
+
+    def _open_terms(self):
+        """整学期记录先写到{session}.bits.tmp：从头重算时从空白开始，否则复制一份已有的记录"""
+        for session in SESSIONS:
+            path = self.system.term_history(session).path
+            tmp = path.with_name(path.name + '.tmp')
+            tmp.unlink(missing_ok=True)
+            if not self.fresh and path.exists():
+                shutil.copyfile(path, tmp)
+            # 导入过程中生成周报时也要用到新的记录
+            self.terms[session] = self.system.terms[session] = TermHistory(tmp)
+
+    def _commit_terms(self):
+        for session, term in self.terms.items():
+            path = term.path.with_name(term.path.name[:-len('.tmp')])
+            if term.path.exists():
+                os.replace(term.path, path)
+            else:
+                path.unlink(missing_ok=True)  # 从头重算但没有任何记录
+            term.path = path
+        self.terms = {}
+
+    def _discard_terms(self):
+        for session, term in self.terms.items():
+            term.path.unlink(missing_ok=True)
+            self.system.terms.pop(session, None)
+        self.terms = {}
+
+    def feed_day(self, day, present):
+        """记录一天的考勤"""
+        week = day.isocalendar()[:2]
+        if self.weekly_reports and self.week is not None and week != self.week:
+            self.close_week(day)
+        self.week = week
+
+        sessions = self.sessions or [s for s in SESSIONS if s in present]
+        for session in sessions:
+            roster = self.rosters[session]
+            names = present.get(session, ())
+            mask = roster.mask_of(names)
+            self.stats.unknown += len(names) - bin(mask).count('1')
+            roster.record_mask(mask)
+            self.terms[session].append(day, self.system.index.ids_of(names))
+        self.stats.days += 1
+
+    def close_week(self, next_day):
+        """上一周结束：写入数据、生成周报并重置"""
+        self.flush()
+        # 报告时间取下一条记录所在周的周一零点前
+        monday = next_day - timedelta(days=next_day.weekday())
+        report_time = datetime.combine(monday, datetime.min.time()) - timedelta(seconds=1)
+        self.stats.reports.append(self.system.generate_summary_report(now=report_time))
+        for roster in self.rosters.values():
+            roster.reset_data()
+
+    def flush(self):
+        """把矩阵写回eggs/"""
+        for session, roster in self.rosters.items():
+            self.system.save_roster(session, roster)
+
+    def run(self, days):
+        """处理所有天并写回数据；中途出错（例如文件不存在或未按日期排序）时原有的整学期记录保持不变"""
+        self._open_terms()
+        try:
+            for day, present in days:
+                self.feed_day(day, present)
+            self.flush()
+        except BaseException:
+            self._discard_terms()
+            raise
+        self._commit_terms()
+        return self.stats
+
+
+def import_events(path, system=None, fmt=None, sessions=None, weekly_reports=False,
+                  fresh=True, report=False):
+    """导入一个签到文件，返回统计信息"""
+    system = system or AttendanceSystem()
+    stats = BatchStats()
+    if weekly_reports:
+        # 导入过程中会写出周报和快照，先把整个文件读一遍，
+        # 文件不存在或未按日期排序时什么都不写
+        for _ in group_by_day(read_events(path, fmt)):
+            pass
+    importer = BatchImporter(system, sessions, weekly_reports, fresh, stats)
+    importer.run(group_by_day(read_events(path, fmt, stats)))
+    if report:
+        stats.reports.append(system.generate_summary_report())
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入历史签到记录并重新计算分数")
+    parser.add_argument('events', help="CSV或JSONL签到文件，按日期升序")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="文件格式，默认按扩展名判断")
+    parser.add_argument('--sessions', help="每天都记录的session，用逗号分隔；默认只记录当天出现过的session")
+    parser.add_argument('--weekly-reports', action='store_true', help="每过一周生成一次周报并重置数据；导入前会先检查整个文件，"
+                        "但生成周报时出错仍可能留下已经写出的周报和数据")
+    parser.add_argument('--report', action='store_true', help="导入结束后生成汇总报告（会重置数据）")
+    parser.add_argument('--append', action='store_true', help="接着已有数据记录，而不是从空白开始")
+    args = parser.parse_args(argv)
+
+    sessions = args.sessions.split(',') if args.sessions else None
+    if sessions and not set(sessions) <= set(SESSIONS):
+        parser.error(f"session只能是: {', '.join(SESSIONS)}")
+
+    stats = import_events(args.events, fmt=args.format, sessions=sessions,
+                          weekly_reports=args.weekly_reports, fresh=not args.append,
+                          report=args.report)
+    json.dump(stats.to_dict(), sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""性能基准：生成指定规模的虚拟名单和考勤，测量评分、读写和报告的耗时与内存峰值
+
+用法：
+    python bench.py --students 5000 --days 14 --output bench_results.json
+    python bench.py --students 5000 --compare bench_results.json
+
+结果是JSON，可以用--compare与之前的结果对比。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+from common import SESSIONS
+from core import AttendanceSystem, ContinuousScoring
+
+
+def make_roster(students):
+    return [f"学生{i:05d}" for i in range(students)]
+
+
+def make_pattern(names, days, seed):
+    """生成每天的到场名单，每个学生有自己的早到概率"""
+    rng = random.Random(seed)
+    rates = {name: rng.uniform(0.3, 0.95) for name in names}
+    return [[name for name in names if rng.random() < rates[name]] for _ in range(days)]
+
+
+def make_workdir(names, pattern, storage):
+    """在临时目录中创建设置文件和已有数据"""
+    workdir = Path(tempfile.mkdtemp(prefix='early_bird_bench_'))
+    (workdir/'bacon').mkdir()
+    setting = {
+        'points': {'_3_days': 1, '_7_days': 2.5},
+        'timer': {'on': False},
+        'storage': {'mode': storage},
+        'namelist': names,
+    }
+    with open(workdir/'bacon/Setting.yml', 'w', encoding='utf-8') as fp:
+        yaml.dump(setting, fp, allow_unicode=True)
+
+    os.chdir(workdir)
+    system = AttendanceSystem()
+    for session in SESSIONS:
+        students = {name: ContinuousScoring() for name in names}
+        for present in pattern:
+            present = set(present)
+            for name, student in students.items():
+                student.record_attendance(name in present)
+        system.save_student_data(session, students)
+    return workdir
+
+
+class Bench:
+    """依次运行各个用例，每个用例重复多次后再单独测一次内存峰值"""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, name, func, setup=None):
+        timings = []
+        for _ in range(self.repeat):
+            arg = setup() if setup else None
+            started = time.perf_counter()
+            func(arg)
+            timings.append(time.perf_counter() - started)
+
+        # tracemalloc会拖慢运行，单独测一次
+        arg = setup() if setup else None
+        tracemalloc.start()
+        func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {
+            'name': name,
+            'min_s': min(timings),
+            'median_s': statistics.median(timings),
+            'mean_s': statistics.fmean(timings),
+            'peak_kib': round(peak / 1024, 1),
+        }
+        self.results.append(result)
+        print(f"{name:<36} {result['median_s'] * 1000:10.2f} ms  {result['peak_kib']:10.1f} KiB",
+              file=sys.stderr)
+        return result
+
+
+def run_benchmarks(students, days, repeat, seed, storage='json'):
+    names = make_roster(students)
+    pattern = make_pattern(names, days, seed)
+    cwd = Path.cwd()
+    workdir = make_workdir(names, pattern, storage)
+    try:
+        system = AttendanceSystem()
+        bench = Bench(repeat)
+        today = pattern[-1]
+
+        def fresh():
+            return {name: ContinuousScoring() for name in names}
+
+        def record_days(students):
+            for present in pattern:
+                present = set(present)
+                for name, student in students.items():
+                    student.record_attendance(name in present)
+
+        bench.run('ContinuousScoring.record_attendance', record_days, fresh)
+
+        loaded = system.load_student_data('morning')
+        bench.run('ContinuousScoring.calculate_scores',
+                  lambda _: [student.calculate_scores() for student in loaded.values()])
+
+        bench.run('AttendanceSystem.load_student_data', lambda _: system.load_student_data('morning'))
+        bench.run('AttendanceSystem.save_student_data', lambda _: system.save_student_data('morning', loaded))
+        bench.run('AttendanceSystem.record_attendance', lambda _: system.record_attendance('afternoon', today))
+        bench.run('AttendanceSystem.save_breakpoint', lambda _: system.save_breakpoint('morning', today))
+        bench.run('AttendanceSystem.load_breakpoint', lambda _: system.load_breakpoint('morning'))
+
+        # 生成报告会重置数据，每次运行前恢复
+        snapshot = {session: system.load_student_data(session) for session in SESSIONS}
+
+        def restore():
+            for session, students in snapshot.items():
+                system.save_student_data(session, students)
+
+        bench.run('AttendanceSystem.generate_summary_report',
+                  lambda _: system.generate_summary_report(), restore)
+        return bench.results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline_file):
+    """与之前的结果对比中位数耗时"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    print(f"{'用例':<36} {'之前(ms)':>10} {'现在(ms)':>10} {'比例':>7}")
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            continue
+        ratio = result['median_s'] / old['median_s'] if old['median_s'] else float('inf')
+        print(f"{result['name']:<36} {old['median_s'] * 1000:10.2f} {result['median_s'] * 1000:10.2f} {ratio:7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="考勤系统性能基准")
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=14, help="预先生成的历史天数")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--storage', choices=['json', 'binary', 'journal', 'sqlite'], default='json', help="数据存储方式")
+    parser.add_argument('--output', help="结果写入的JSON文件，默认输出到标准输出")
+    parser.add_argument('--compare', help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.students, args.days, args.repeat, args.seed, args.storage)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'students': args.students,
+            'days': args.days,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'storage': args.storage,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
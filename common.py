@@ -0,0 +1,27 @@
+"""各模块共用的常量和文件写入"""
+import json
+import os
+from contextlib import contextmanager
+
+SESSIONS = ("morning", "afternoon")
+
+
+@contextmanager
+def atomic_open(path, mode='w', **open_kwargs):
+    """打开path的临时文件供写入，正常结束时落盘并原子替换；出错时删除临时文件，旧文件不受影响"""
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, path)
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """先写临时文件再原子替换，写到一半崩溃也不会破坏旧文件"""
+    with atomic_open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
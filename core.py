@@ -0,0 +1,577 @@
+"""考勤核心：评分与数据持久化，不依赖tkinter"""
+from collections import deque
+from pathlib import Path
+from datetime import date, datetime
+import startup
+from common import SESSIONS
+from leaderboard import LiveLeaderboard
+from metrics import Metrics
+from roster import RosterMatrix, RosterIndex
+from rules import StreakRules
+from settings import SettingsWatcher, diff_settings, dump_yaml, load_settings
+from storage import open_backend
+from term import TermHistory
+from report import make_renderer, ranked_rows, write_report
+from weekly import WeeklyLedger, make_snapshot, week_key, week_range
+
+# 开启性能统计时计时的操作
+TIMED_OPERATIONS = ('load_student_data', 'save_student_data', 'record_attendance',
+                    'generate_summary_report', 'load_breakpoint', 'save_breakpoint', 'clear_breakpoint')
+# 存储后端的读写：提交考勤时record_attendance直接调用后端，不经过上面的load/save_student_data
+TIMED_STORAGE_OPERATIONS = ('load_students', 'save_students', 'record')
+
+class ContinuousScoring:
+    """连续考勤评分系统，替代生成器的可序列化类
+    
+    每记录一天只更新几个计数器，读取分数是O(1)，每个学生占用的内存固定。
+    """
+    
+    def __init__(self, max_days=7):
+        self.history = deque(maxlen=max_days * 2)  # 只保留最近max_days*2天的记录
+        self.max_days = max_days
+        self.current_day = 0
+        self.streak = 0      # 当前连续出勤天数
+        self._total = 0      # history中的出勤天数
+        self._runs = deque([0])  # 最近max_days天内的各段连续出勤天数
+        self._window = 0     # 最近max_days天实际记录的天数
+        self._3_day = 0      # 窗口内长度为3~6天的连续段数
+        self._7_day = 0      # 窗口内长度为7天的连续段数
+    
+    def _tally(self, run, sign):
+        """把一段连续出勤计入或移出分数计数器"""
+        if run == 7:
+            self._7_day += sign
+        elif 3 <= run < 7:
+            self._3_day += sign
+    
+    def _push_window(self, arrived):
+        """窗口右移一天：先移出最早的一天，再加入今天"""
+        runs = self._runs
+        if self._window == self.max_days:
+            if self.history[-self.max_days]:
+                # 最早的一天属于第一段连续出勤
+                self._tally(runs[0], -1)
+                runs[0] -= 1
+                self._tally(runs[0], 1)
+            else:
+                # 最早的一天是缺勤，它前面的空段随之移出
+                runs.popleft()
+            self._window -= 1
+        
+        if arrived:
+            self._tally(runs[-1], -1)
+            runs[-1] += 1
+            self._tally(runs[-1], 1)
+        else:
+            runs.append(0)
+        self._window += 1
+    
+    def _rebuild_window(self):
+        """根据history重建窗口计数器"""
+        self._runs = deque([0])
+        self._window = 0
+        self._3_day = 0
+        self._7_day = 0
+        history = self.history
+        self.history = deque(maxlen=history.maxlen)
+        for arrived in history:
+            self._push_window(arrived)
+            self.history.append(arrived)
+        self._total = sum(self.history)
+    
+    def record_attendance(self, today_arrived):
+        """记录当天考勤"""
+        today_arrived = bool(today_arrived)
+        self.streak = self.streak + 1 if today_arrived else 0
+        
+        self._push_window(today_arrived)
+        if len(self.history) == self.history.maxlen and self.history[0]:
+            self._total -= 1
+        self.history.append(today_arrived)
+        self._total += today_arrived
+        self.current_day += 1
+    
+    def calculate_scores(self):
+        """计算3天和7天连续出勤分数"""
+        return self._3_day, self._7_day
+    
+    def recompute_scores(self):
+        """用最近max_days天的记录完整重算分数，用于校验增量计数器"""
+        history = list(self.history)
+        recent_history = history[-self.max_days:] if len(history) >= self.max_days else history
+        
+        # 重建连续出勤记录
+        scoring = [0]
+        for arrived in recent_history:
+            if arrived:
+                scoring[-1] += 1
+            else:
+                scoring.append(0)
+        
+        # 计算分数
+        _7_day = sum(1 for j in scoring if j == 7)
+        _3_day = sum(1 for j in scoring if 3 <= j < 7)
+        
+        return _3_day, _7_day
+    
+    def check_consistency(self):
+        """检查增量计数器与完整重算的结果是否一致"""
+        return (self.calculate_scores() == self.recompute_scores()
+                and self._total == sum(self.history))
+    
+    def get_current_streak(self):
+        """获取当前连续出勤天数"""
+        return self.streak
+    
+    def get_total_attendance(self):
+        """获取总出勤天数"""
+        return self._total
+    
+    def get_attendance_rate(self):
+        """获取出勤率"""
+        if len(self.history) == 0:
+            return 0
+        return self._total / len(self.history)
+    
+    def reset_data(self):
+        """重置数据，开始新的一周"""
+        self.history.clear()
+        self.current_day = 0
+        self.streak = 0
+        self._rebuild_window()
+    
+    def to_dict(self):
+        """转换为可序列化的字典"""
+        return {
+            # 只需保存当前连续天数，保持与旧格式兼容
+            'scoring': [self.streak],
+            'history': list(self.history),
+            'max_days': self.max_days,
+            'current_day': self.current_day
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """从字典恢复对象"""
+        obj = cls(data.get('max_days', 7))
+        scoring = data.get('scoring') or [0]
+        obj.streak = scoring[-1]
+        obj.history.extend(data.get('history', []))
+        obj.current_day = data.get('current_day', 0)
+        obj._rebuild_window()
+        return obj
+
+class AttendanceSystem:
+    """考勤系统主类，root为班级目录（其中有bacon/、eggs/、reports/），默认为当前目录"""
+    
+    def __init__(self, root=None):
+        startup.mark("导入模块")
+        self.cwd = Path(root) if root is not None else Path.cwd()
+        self.setup_directories()
+        self.setting = self.load_settings()
+        self.rules = StreakRules.from_setting(self.setting)
+        startup.mark("读取设置")
+        # 学生ID索引，数据文件以ID为键
+        self.index = RosterIndex(self.cwd/'eggs/roster.json')
+        known = set(self.index.names)
+        sids = self.index.sync(self.setting['namelist'], self.setting.get('renames'))
+        startup.mark("名单索引")
+        self.recorded = {}  # 每个session最近一次记录后的学生数据
+        self.terms = {}     # 每个session的整学期记录，按需加载
+        self.ledger = None  # 周快照与排行，按需加载
+        self.live = None    # 本周实时排行，第一次记录考勤或查看时建立
+        self.listeners = [] # 设置重新加载后的回调，参数为变化的项
+        self.watcher = SettingsWatcher(self.cwd/'bacon/Setting.yml')
+        self.storage = self.open_storage()
+        if known and set(sids) - known:
+            # 上次运行之后名单里加了人，为他们补上空白数据
+            self.storage.update_roster(set(sids) - known, ())
+        # 性能统计，未开启时为None，不包装任何方法
+        self.metrics = Metrics.from_setting(self.setting, self.cwd)
+        if self.metrics is not None:
+            self.storage.set_io_counter(self.metrics.count_bytes)
+            self.metrics.instrument(self, TIMED_OPERATIONS)
+            self.metrics.instrument(self.storage, TIMED_STORAGE_OPERATIONS, 'storage.')
+        startup.mark("打开存储")
+        self.apply_display_settings()
+    
+    def apply_display_settings(self):
+        """按设置更新字体"""
+        self.font_chinese = (
+            self.setting.get('display', {}).get('win', {}).get('font', 'Microsoft YaHei UI'),
+            self.setting.get('display', {}).get('win', {}).get('font_size', 10)
+        )
+    
+    def check_settings(self):
+        """Setting.yml有修改时重新加载，返回reload_settings()的结果，没有修改时返回None"""
+        if not self.watcher.changed():
+            return None
+        return self.reload_settings()
+    
+    def reload_settings(self):
+        """重新读取并校验设置，不需要重启程序
+
+        返回{'changed': 有变化的顶层项, 'added': 新加入的学生, 'retired': 移出名单的学生}；
+        设置有错误时保留原来的设置，返回{'error': 错误信息}。
+        名单变化时只为新学生创建数据、删除移出名单的学生，其他数据不动。
+        """
+        try:
+            setting = self.load_settings()
+        except ValueError as e:
+            return {'error': str(e)}
+        changed = diff_settings(self.setting, setting)
+        added, retired = [], []
+        if changed & {'namelist', 'renames'}:
+            before = self.index.ids_of(self.setting['namelist'])
+            after = set(self.index.sync(setting['namelist'], setting.get('renames')))
+            added = [self.index.name_of(sid) for sid in after - before]
+            retired = [self.index.name_of(sid) for sid in before - after]
+            if added or retired:
+                self.storage.update_roster(after - before, before - after)
+                self.recorded.clear()
+        self.setting = setting
+        if changed & {'rules', 'points'}:
+            self.rules = StreakRules.from_setting(setting)
+        if changed & {'rules', 'points', 'namelist', 'renames'} and self.live is not None:
+            # 计分方式或名单变了，按新的设置重新排行
+            self.invalidate_live_board()
+            self.live_board()
+        if 'display' in changed:
+            self.apply_display_settings()
+        if 'terms' in changed:
+            self.ledger = None
+        changes = {'changed': changed, 'added': added, 'retired': retired}
+        for callback in self.listeners:
+            callback(changes)
+        return changes
+    
+    def setup_directories(self):
+        """创建必要的目录"""
+        if not (self.cwd/'eggs').exists():
+            (self.cwd/'eggs').mkdir()
+        if not (self.cwd/'bacon').exists():
+            (self.cwd/'bacon').mkdir()
+        if not (self.cwd/'reports').exists():
+            (self.cwd/'reports').mkdir()
+    
+    def load_settings(self):
+        """加载或创建设置文件"""
+        settings_file = self.cwd/'bacon/Setting.yml'
+    
+        if not settings_file.exists():
+            # 创建默认设置
+            default_settings = {
+                'points': {
+                    '_3_days': 1,
+                    '_7_days': 3
+                },
+                'timer': {
+                    'on': True,
+                    'morning': '7:05',
+                    'afternoon': '13:05'
+                },
+                'display': {
+                    'win': {
+                        'row_num': 7,
+                        'font': 'Microsoft YaHei UI',
+                        'font_size': 10
+                    },
+                    'md': {
+                        'column_num': 12
+                    }
+                },
+                'storage': {
+                    'mode': 'json',
+                    'snapshot_every': 50
+                },
+                'namelist': ['学生1', '学生2', '学生3', '学生4', '学生5', '学生6', '学生7', 
+                           '学生8', '学生9', '学生10', '学生11', '学生12', '学生13', '学生14']
+            }
+            # 将默认设置写入文件
+            dump_yaml(default_settings, settings_file)
+            return default_settings
+        else:
+            # 文件没变时直接使用缓存，不需要解析YAML
+            return load_settings(settings_file, self.cwd/'eggs/settings.cache')
+    
+    def open_storage(self, mode=None):
+        """打开存储后端，默认使用设置中的storage.mode"""
+        storage = self.setting.get('storage', {})
+        return open_backend(mode or storage.get('mode', 'json'), self.cwd/'eggs', self.index,
+                            self.setting['namelist'], ContinuousScoring, storage)
+    
+    def load_student_ids(self, session):
+        """加载以学生ID为键的数据"""
+        return self.storage.load_students(session)
+    
+    def save_student_ids(self, session, students):
+        """保存以学生ID为键的数据"""
+        self.recorded.pop(session, None)
+        self.invalidate_live_board()
+        self.storage.save_students(session, students)
+    
+    def load_student_data(self, session):
+        """加载学生数据，返回{姓名: ContinuousScoring}"""
+        name_of = self.index.name_of
+        return {name_of(sid): student for sid, student in self.load_student_ids(session).items()}
+    
+    def save_student_data(self, session, students):
+        """保存学生数据"""
+        intern = self.index.intern
+        self.save_student_ids(session, {intern(name): student for name, student in students.items()})
+        self.index.save()
+    
+    def load_roster(self, session):
+        """以整班矩阵的形式加载学生数据"""
+        students = self.load_student_data(session)
+        return RosterMatrix.from_students(students, self.setting['namelist'])
+    
+    def save_roster(self, session, roster):
+        """把整班矩阵写回学生数据"""
+        students = {}
+        for name, history, streak in roster.iter_students():
+            students[name] = ContinuousScoring.from_dict({
+                'scoring': [streak],
+                'history': history,
+                'max_days': roster.max_days,
+                'current_day': roster.current_day
+            })
+        self.save_student_data(session, students)
+    
+    def record_attendance(self, session, present_students, day=None):
+        """记录考勤，day为考勤日期（默认今天）"""
+        present_ids = self.index.ids_of(present_students)
+        # 更新并保存每个学生的考勤记录
+        students = self.storage.record(session, present_ids, day)
+        self.recorded[session] = students
+        # 整学期记录不随每周重置
+        self.term_history(session).append(day or date.today(), present_ids)
+        
+        # 计算并显示分数
+        scores = {}
+        name_of = self.index.name_of
+        weekend = self.recent_weekends(session, self.rules.window)
+        for sid, student in students.items():
+            scores[name_of(sid)] = self.score_student(student, weekend)
+        if self.live is None:
+            # 排行还没有建立（刚启动或刚重置）：这个session直接用刚算好的分数，只需再读另一个session
+            self.live_board({session: scores})
+        else:
+            # 实时排行只更新分数有变化的学生
+            self.live.update(session, scores)
+        
+        return scores
+    
+    def score_student(self, student, weekend=None):
+        """按计分规则计算一个学生的各档次数；默认规则直接使用增量计数器"""
+        if self.rules.is_default():
+            return student.calculate_scores()
+        return self.rules.evaluate(student.history, weekend)
+    
+    def score_roster(self, session, roster):
+        """按计分规则计算整班的各档次数，返回{姓名: (各档次数)}"""
+        if self.rules.is_default():
+            return roster.calculate_scores()
+        window = roster.rows[-self.rules.window:]
+        counts = self.rules.evaluate_roster(window, len(roster), self.recent_weekends(session, len(window)))
+        return dict(zip(roster.names, counts))
+    
+    def session_scores(self, session):
+        """整个session的各档次数{姓名: (各档次数)}和已记录的天数
+
+        默认规则直接取每个学生的增量计数器，不需要建立整班矩阵。
+        """
+        if not self.rules.is_default():
+            roster = self.load_roster(session)
+            return self.score_roster(session, roster), roster.current_day
+        students = self.load_student_data(session)
+        scores = {name: student.calculate_scores() for name, student in students.items()}
+        return scores, max((student.current_day for student in students.values()), default=0)
+    
+    def recent_weekends(self, session, n):
+        """最近n次记录的考勤是否在周末，周末规则为count时返回None
+
+        按记录的顺序取日期而不是按去重后的日期：同一天重新提交或补录以前的日期时，
+        学生的增量记录中也各多了一天，两者仍然逐项对齐。
+        """
+        if self.rules.weekends == 'count':
+            return None
+        return [date.fromordinal(day).weekday() >= 5 for day in self.term_history(session).recorded[-n:]]
+    
+    def get_current_streaks(self, session, names):
+        """获取学生的当前连续出勤天数，优先使用最近一次记录后的数据，不再重新读文件"""
+        students = self.recorded.get(session)
+        streaks = {}
+        for name in names:
+            sid = self.index.id_of(name)
+            if sid is None:
+                continue
+            # 没有缓存时只读取需要的学生
+            student = students.get(sid) if students is not None else self.storage.load_student(session, sid)
+            if student is not None:
+                streaks[name] = student.get_current_streak()
+        return streaks
+    
+    def term_history(self, session):
+        """某个session的整学期记录（eggs/term/{session}.bits）"""
+        term = self.terms.get(session)
+        if term is None:
+            term = self.terms[session] = TermHistory(self.cwd/'eggs'/'term'/f'{session}.bits')
+        return term
+    
+    def term_stats(self, name, session, start=None, end=None):
+        """某个学生在[start, end]之间的早到天数、出勤率和最长连续天数，日期默认整学期"""
+        sid = self.index.id_of(name)
+        if sid is None:
+            return None
+        term = self.term_history(session)
+        return {
+            'total': term.total(sid, start, end),
+            'rate': term.rate(sid, start, end),
+            'longest_streak': term.longest_streak(sid, start, end),
+        }
+    
+    def weekly_ledger(self):
+        """周快照与月/学期排行（eggs/weeks/）"""
+        if self.ledger is None:
+            self.ledger = WeeklyLedger(self.cwd/'eggs'/'weeks', self.setting.get('terms'))
+        return self.ledger
+    
+    def last_recorded_day(self):
+        """整学期记录中最近的考勤日期，没有记录时返回None"""
+        days = [term.days[-1] for term in map(self.term_history, SESSIONS) if term.days]
+        return date.fromordinal(max(days)) if days else None
+    
+    def save_week_snapshot(self, key, morning_scores, afternoon_scores):
+        """把一周的分数保存为快照，两个参数都是{姓名: (3天, 7天)}"""
+        scores = {}
+        empty = (0,) * len(self.rules.keys)
+        for name in self.setting['namelist']:
+            sid = self.index.id_of(name)
+            scores[sid] = (morning_scores.get(name, empty), afternoon_scores.get(name, empty))
+        self.weekly_ledger().save_week(make_snapshot(key, self.setting['points'], self.rules.keys, scores))
+    
+    def correct_week(self, key):
+        """用整学期记录重新计算已经生成过周报的一周（例如补录之后），只更新这一周的快照"""
+        start, end = week_range(key)
+        week_scores = []
+        for session in SESSIONS:
+            term = self.term_history(session)
+            lo, hi = term.span(start, end)
+            rows = term.rows[lo:hi + 1]
+            weekend = [date.fromordinal(day).weekday() >= 5 for day in term.days[lo:hi + 1]]
+            scores = {}
+            for name in self.setting['namelist']:
+                bit = 1 << self.index.id_of(name)
+                scores[name] = self.rules.evaluate([bool(mask & bit) for mask in rows], weekend)
+            week_scores.append(scores)
+        self.save_week_snapshot(key, *week_scores)
+    
+    def leaderboard(self, period, top=None):
+        """月份（month:2026-03）或学期（term:2026春）排行，返回[(姓名, 分数, {分数项: 次数})]"""
+        name_of = self.index.name_of
+        return [(name_of(sid), pts, counts) for sid, pts, counts in self.weekly_ledger().leaderboard(period, top)]
+    
+    def attendance_rate(self, name, session, start, end):
+        """某个学生在[start, end]之间的出勤率，没有记录时返回None"""
+        sid = self.index.id_of(name)
+        if sid is None:
+            return None
+        try:
+            return self.storage.attendance_rate(sid, session, start, end)
+        except NotImplementedError:
+            # 其他存储方式不保存日期，改用整学期记录
+            return self.term_history(session).rate(sid, start, end)
+    
+    def live_board(self, known=None):
+        """本周实时排行，第一次使用时按当前数据建立；known为{session: 已经算好的各档次数}，这些session不再读取"""
+        if self.live is None:
+            board = LiveLeaderboard(self.cwd/'reports'/'leaderboard_live.json', self.setting['namelist'],
+                                    self.rules, self.setting['points'])
+            known = known or {}
+            board.load({session: known[session] if session in known else self.session_scores(session)[0]
+                        for session in SESSIONS})
+            self.live = board
+        return self.live
+    
+    def invalidate_live_board(self):
+        """数据被整体替换或重置后，实时排行需要重新建立"""
+        self.live = None
+        (self.cwd/'reports'/'leaderboard_live.json').unlink(missing_ok=True)
+    
+    def verify_scores(self, session):
+        """校验增量分数与完整重算是否一致，返回不一致的学生名单"""
+        students = self.load_student_data(session)
+        return [name for name, student in students.items() if not student.check_consistency()]
+    
+    def reset_all_data(self):
+        """重置所有学生的数据，开始新的一周"""
+        self.storage.reset()
+        self.recorded.clear()
+        self.invalidate_live_board()
+    
+    def generate_summary_report(self, now=None, fmt='md', top=None, reset=True, collect=None):
+        """生成汇总报告并保存到reports/，只显示最终分数
+
+        now用于补录历史数据时指定报告时间，默认为当前时间；fmt为md、csv或html；
+        top指定时只输出前top名；reset为False时只生成报告，不结束本周；
+        collect为列表时把每个学生的(姓名, 总分)追加到其中，用于全校排行
+        """
+        now = now or datetime.now()
+        # 加载上午和下午的数据并计算分数
+        morning_scores, morning_days = self.session_scores("morning")
+        afternoon_scores, afternoon_days = self.session_scores("afternoon")
+        points = self.setting['points']
+        rules = self.rules
+        empty = (0,) * len(rules.keys)
+        
+        def totals():
+            """逐个学生计算总分"""
+            for name in self.setting['namelist']:
+                counts = zip(morning_scores.get(name, empty), afternoon_scores.get(name, empty))
+                total = rules.points([m + a for m, a in counts], points)
+                if collect is not None:
+                    collect.append((name, total))
+                yield name, total
+        
+        # 逐行写入文件
+        renderer = make_renderer(fmt, self.setting)
+        meta = {
+            'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
+            'tiers': [(text, points[key]) for key, text in rules.describe()],
+            'top': top,
+            'reset': reset,
+        }
+        report_file = self.cwd / 'reports' / f'考勤汇总_{now.strftime("%Y%m%d_%H%M%S")}.{renderer.extension}'
+        write_report(report_file, ranked_rows(totals(), top), renderer, meta)
+        
+        if reset:
+            # 保存本周快照，用于月/学期排行；重置后没有新记录时不覆盖已有的快照
+            if morning_days or afternoon_days:
+                self.save_week_snapshot(week_key(self.last_recorded_day() or now.date()),
+                                        morning_scores, afternoon_scores)
+            # 重置所有数据，开始新的一周
+            self.reset_all_data()
+        
+        return report_file
+    
+    def load_breakpoint(self, session, day=None):
+        """加载断点数据；给出day时只接受那一天的暂存，其他日期（包括没有日期的旧版文件）返回空名单"""
+        if day is not None and self.storage.breakpoint_day(session) != day:
+            return []
+        present_students = []
+        for item in self.storage.load_breakpoint(session):
+            if isinstance(item, str):
+                # 旧版文件直接保存姓名
+                present_students.append(item)
+            elif item in self.index.names:
+                present_students.append(self.index.name_of(item))
+        return present_students
+    
+    def save_breakpoint(self, session, present_students, day=None):
+        """保存断点数据，day为这些签到所属的考勤日期（默认今天）"""
+        self.storage.save_breakpoint(session, self.index.ids_of(present_students), day)
+    
+    def clear_breakpoint(self, session):
+        """清除指定session的断点数据"""
+        self.storage.clear_breakpoint(session)
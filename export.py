@@ -0,0 +1,189 @@
+"""导出逐日考勤明细：每个学生每个session每天一行，附带连续天数和本周分数
+
+数据来自eggs/term/{session}.bits，用mmap按需读取，每次只处理一个学生，
+不把整学期的位图读入内存；全班、整学期导出时内存占用也不随人数和天数增长。
+
+每行的字段：
+    date      日期
+    session   morning或afternoon
+    name      姓名
+    arrived   当天是否早到（1/0）
+    streak    到这一天为止的连续早到天数（按整学期记录计算）
+    points    这一session本周（周一起）到这一天为止的分数，按当前的计分规则
+
+用法：
+    python export.py 考勤明细.csv
+    python export.py 考勤明细.jsonl.gz --start 2026-03-01 --end 2026-03-31
+    python export.py - --sessions morning --students 张三,李四 --format jsonl
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import date
+from pathlib import Path
+
+from common import SESSIONS, atomic_open
+from term import TermReader
+from weekly import week_key
+
+FIELDS = ('date', 'session', 'name', 'arrived', 'streak', 'points')
+COMPRESSLEVEL = 6  # 与gzip命令的默认值相同，比最高压缩快很多，文件只大一点
+
+
+class _SessionDays:
+    """一个session的整学期记录，以及每天的日期、所在周和是否周末（只与天数有关）"""
+
+    def __init__(self, path):
+        self.reader = TermReader(path)
+        days = [date.fromordinal(ordinal) for ordinal in self.reader.days]
+        self.dates = [day.isoformat() for day in days]
+        self.weeks = [week_key(day) for day in days]
+        self.weekend = [day.weekday() >= 5 for day in days]
+
+    def span(self, start=None, end=None):
+        """日期范围对应的下标区间[lo, hi)"""
+        days = self.reader.days
+        lo = bisect_left(days, start.toordinal()) if start else 0
+        hi = bisect_right(days, end.toordinal()) if end else len(days)
+        return lo, hi
+
+
+def _student_rows(days, session, name, sid, score, lo, hi):
+    """一个学生在一个session中第lo到hi-1天的行；连续天数和本周分数要从更早的记录算起"""
+    streak = 0
+    week = None
+    first = 0   # 本周第一天的下标
+    bits = []
+    for d in range(hi):
+        arrived = days.reader.arrived(d, sid)
+        streak = streak + 1 if arrived else 0
+        if days.weeks[d] != week:
+            week, first = days.weeks[d], d
+            bits.clear()
+        bits.append(arrived)
+        if d < lo:
+            continue
+        yield days.dates[d], session, name, int(arrived), streak, score(tuple(bits), days, first, d)
+
+
+def iter_matrix(system, start=None, end=None, sessions=SESSIONS, names=None):
+    """按学生、session、日期的顺序逐行产出(日期, session, 姓名, 是否早到, 连续天数, 本周分数)
+
+    names默认为整个名单，名单外的姓名会被跳过。
+    """
+    rules, points = system.rules, system.setting['points']
+    names = system.setting['namelist'] if names is None else names
+    cache = {}  # 一周最多7天，不同的出勤情况很少，算过的直接复用
+
+    def score(bits, days, first, d):
+        weekend = None if rules.weekends == 'count' else tuple(days.weekend[first:d + 1])
+        key = bits, weekend
+        total = cache.get(key)
+        if total is None:
+            total = cache[key] = rules.points(rules.evaluate(bits, weekend), points)
+        return total
+
+    sources = {session: _SessionDays(system.cwd/'eggs'/'term'/f'{session}.bits') for session in sessions}
+    spans = {session: days.span(start, end) for session, days in sources.items()}
+    try:
+        for name in names:
+            sid = system.index.id_of(name)
+            if sid is None:
+                continue
+            for session, days in sources.items():
+                lo, hi = spans[session]
+                yield from _student_rows(days, session, name, sid, score, lo, hi)
+    finally:
+        for days in sources.values():
+            days.reader.close()
+
+
+def write_csv(rows, f):
+    writer = csv.writer(f)
+    writer.writerow(FIELDS)
+    count = 0
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+    return count
+
+
+def write_jsonl(rows, f):
+    count = 0
+    for count, row in enumerate(rows, 1):
+        f.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n')
+    return count
+
+
+def _write_to(raw, write, rows, fmt, compress):
+    """写入二进制文件raw，需要时压缩；CSV带BOM方便Excel打开"""
+    encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+    if compress:
+        with gzip.open(raw, 'wt', compresslevel=COMPRESSLEVEL, encoding=encoding, newline='') as f:
+            return write(rows, f)
+    f = io.TextIOWrapper(raw, encoding=encoding, newline='')
+    try:
+        return write(rows, f)
+    finally:
+        f.flush()
+        f.detach()  # raw由调用者关闭
+
+
+def export(rows, path, fmt=None, compress=None):
+    """把rows写入path，返回行数
+
+    fmt默认按扩展名判断（.jsonl为JSONL，其他为CSV），compress默认在扩展名为.gz时压缩。
+    写入文件时先写临时文件，完成后再替换，中途出错不会留下不完整的文件。
+    """
+    name = str(path)
+    if compress is None:
+        compress = name.endswith('.gz')
+    if fmt is None:
+        fmt = 'jsonl' if name.removesuffix('.gz').endswith(('.jsonl', '.json')) else 'csv'
+    write = write_jsonl if fmt == 'jsonl' else write_csv
+    if name == '-':
+        if compress:
+            return _write_to(sys.stdout.buffer, write, rows, fmt, compress)
+        return write(rows, sys.stdout)
+    with atomic_open(Path(path), 'wb') as raw:
+        return _write_to(raw, write, rows, fmt, compress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出逐日考勤明细（CSV或JSONL）")
+    parser.add_argument('output', help="输出文件，-为标准输出；扩展名为.gz时压缩")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="文件格式，默认按扩展名判断")
+    parser.add_argument('--gzip', action='store_true', help="用gzip压缩")
+    parser.add_argument('--start', type=date.fromisoformat, help="开始日期（含），例如2026-03-01")
+    parser.add_argument('--end', type=date.fromisoformat, help="结束日期（含）")
+    parser.add_argument('--sessions', default=",".join(SESSIONS), help="逗号分隔，默认morning,afternoon")
+    parser.add_argument('--students', help="逗号分隔的姓名，默认整个名单")
+    parser.add_argument('--root', default='.', help="班级目录，默认为当前目录")
+    args = parser.parse_args(argv)
+
+    sessions = [s.strip() for s in args.sessions.split(",") if s.strip()]
+    unknown = [s for s in sessions if s not in SESSIONS]
+    if unknown:
+        parser.error(f"未知的session: {', '.join(unknown)}")
+
+    from core import AttendanceSystem
+
+    system = AttendanceSystem(args.root)
+    names = None
+    if args.students:
+        names = [s.strip() for s in args.students.split(",") if s.strip()]
+        missing = [name for name in names if system.index.id_of(name) is None]
+        if missing:
+            print(f"名单中没有: {', '.join(missing)}", file=sys.stderr)
+
+    rows = iter_matrix(system, args.start, args.end, sessions, names)
+    count = export(rows, args.output, args.format, args.gzip or None)
+    if args.output != '-':
+        print(f"{args.output}\t{count}行")
+
+
+if __name__ == "__main__":
+    main()
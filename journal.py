@@ -0,0 +1,144 @@
+"""追加式考勤日志：每次提交只追加一行记录，定期写快照压缩日志"""
+import json
+import os
+from datetime import date
+
+from common import SESSIONS, atomic_write_json
+
+
+class AttendanceJournal:
+    """日志式存储
+
+    eggs/snapshot.json 保存某一序号时的完整状态，eggs/journal.jsonl
+    保存此后的每次提交。启动时先读快照，再重放序号更大的日志记录。
+    学生以整数ID为键；seed(session)在第一次启用日志时提供初始数据，
+    to_id(name)用于读取旧版以姓名为键的快照和记录。
+    """
+
+    def __init__(self, eggs_dir, scoring_cls, seed, to_id, snapshot_every=50):
+        self.eggs_dir = eggs_dir
+        self.scoring_cls = scoring_cls
+        self.seed = seed
+        self.to_id = to_id
+        self.snapshot_every = snapshot_every
+        self.snapshot_file = eggs_dir/'snapshot.json'
+        self.journal_file = eggs_dir/'journal.jsonl'
+        self.state = {}
+        self.seq = 0
+        self.pending = 0  # 快照之后追加的记录数
+        self.on_io = None  # callback(direction, n)，统计读写的字节数
+        self.load()
+
+    def load(self):
+        """读取快照并重放日志尾部"""
+        if self.snapshot_file.exists():
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.seq = snapshot.get('seq', 0)
+            key = int if snapshot.get('version', 1) >= 2 else self.to_id
+            for session in SESSIONS:
+                self.state[session] = self._students_from_dict(snapshot.get(session, {}), key)
+        else:
+            # 第一次启用日志：从原来的eggs/{session}_data.json迁移
+            for session in SESSIONS:
+                self.state[session] = self.seed(session)
+
+        self.pending = 0
+        if self.journal_file.exists():
+            self._replay()
+        if not self.snapshot_file.exists():
+            # 立即写入第一个快照，之后不再依赖旧文件
+            self.compact()
+
+    def _replay(self):
+        """重放日志，丢弃写到一半的尾部记录"""
+        good_end = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_end += len(line)
+                if record['seq'] <= self.seq:
+                    continue
+                self._apply(record)
+                self.seq = record['seq']
+                self.pending += 1
+
+        # 截掉损坏的尾部，之后的追加从干净的位置开始
+        if good_end < self.journal_file.stat().st_size:
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(good_end)
+
+    def _students_from_dict(self, data, key=int):
+        return {key(sid): self.scoring_cls.from_dict(student) for sid, student in data.items()}
+
+    def _apply(self, record):
+        """把一条记录应用到内存状态"""
+        op = record['op']
+        if op == 'record':
+            present = {p if isinstance(p, int) else self.to_id(p) for p in record['present']}
+            for sid, student in self.state[record['session']].items():
+                student.record_attendance(sid in present)
+        elif op == 'reset':
+            for session in SESSIONS:
+                for student in self.state[session].values():
+                    student.reset_data()
+
+    def _append(self, record):
+        """追加一条记录并落盘，然后应用到内存状态"""
+        record = {'seq': self.seq + 1, **record}
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        with open(self.journal_file, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if self.on_io is not None:
+            self.on_io('written', len(line))
+        self._apply(record)
+        self.seq = record['seq']
+        self.pending += 1
+        if self.pending >= self.snapshot_every:
+            self.compact()
+
+    def students(self, session):
+        """获取某个session的学生数据副本"""
+        return {sid: self.scoring_cls.from_dict(student.to_dict())
+                for sid, student in self.state[session].items()}
+
+    def record(self, session, present_ids, day=None):
+        """记录一次提交，present_ids为到场学生的ID集合"""
+        day = day or date.today()
+        self._append({
+            'op': 'record',
+            'date': day.isoformat(),
+            'session': session,
+            'present': sorted(present_ids),
+        })
+        return self.state[session]
+
+    def reset(self):
+        """记录一次每周重置"""
+        self._append({'op': 'reset'})
+
+    def replace(self, session, students):
+        """整体替换某个session的数据（批量导入等），直接写快照"""
+        self.state[session] = {sid: self.scoring_cls.from_dict(student.to_dict())
+                               for sid, student in students.items()}
+        self.compact()
+
+    def compact(self):
+        """写入快照并清空日志"""
+        snapshot = {'version': 2, 'seq': self.seq}
+        for session in SESSIONS:
+            snapshot[session] = {str(sid): student.to_dict() for sid, student in self.state[session].items()}
+        atomic_write_json(self.snapshot_file, snapshot, separators=(',', ':'))
+        if self.on_io is not None:
+            self.on_io('written', self.snapshot_file.stat().st_size)
+        # 快照已落盘；此时崩溃也没关系，重放时会跳过序号不大于快照的记录
+        with open(self.journal_file, 'wb'):
+            pass
+        self.pending = 0
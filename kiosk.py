@@ -0,0 +1,316 @@
+"""本机签到服务：多个签到点同时提交，按窗口批量写入暂存并在截止时间记录考勤
+
+协议是本机TCP上的逐行JSON，每条请求返回一行JSON：
+    {"op": "checkin", "name": "sweet", "location": "flag"}   # time可选，默认收到的时间
+    {"op": "submit", "session": "morning"}                   # 立即记录当天该session的考勤
+    {"op": "stats"}
+
+用法：
+    python kiosk.py --port 8765 --flush 1
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from arrival import ArrivalCalendar, parse_clock
+from common import SESSIONS
+from core import AttendanceSystem
+
+SETTINGS_POLL_SECONDS = 2  # 检查Setting.yml是否修改的间隔
+
+
+def percentile(values, q):
+    """已排序列表的分位数"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class CheckinStats:
+    """吞吐量与延迟统计"""
+
+    def __init__(self, window=10000):
+        self.started = time.monotonic()
+        self.received = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.late = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.submits = 0
+        self.failed_submits = 0  # 记录考勤时出错的提交
+        self.request_latency = deque(maxlen=window)  # 处理单个请求的耗时
+        self.durable_latency = deque(maxlen=window)  # 从收到签到到写入暂存的耗时
+
+    def to_dict(self):
+        uptime = time.monotonic() - self.started
+        result = {
+            'uptime': round(uptime, 3),
+            'received': self.received,
+            'accepted': self.accepted,
+            'duplicates': self.duplicates,
+            'late': self.late,
+            'rejected': self.rejected,
+            'flushes': self.flushes,
+            'submits': self.submits,
+            'failed_submits': self.failed_submits,
+            'throughput': round(self.received / uptime, 1) if uptime else 0.0,
+        }
+        for key in ('request_latency', 'durable_latency'):
+            values = sorted(getattr(self, key))
+            result[key] = {
+                'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+                'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+            }
+        return result
+
+
+class CheckinServer:
+    """异步签到服务
+
+    签到只修改内存中的到场集合，每个刷新窗口把有变化的session一次性写入
+    暂存（断点）文件。所有磁盘操作在同一个工作线程里串行执行。
+    """
+
+    def __init__(self, system, host='127.0.0.1', port=8765, flush_interval=1.0, calendar=None):
+        self.system = system
+        self.host = host
+        self.port = port
+        self.flush_interval = flush_interval
+        self.calendar = calendar or ArrivalCalendar.from_setting(system.setting)
+        self.stats = CheckinStats()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.present = {}      # (日期, session) -> {学生ID}
+        self.submitted = set() # 已记录考勤的(日期, session)
+        self.submitting = set() # 正在记录考勤的(日期, session)，期间的签到算作已提交
+        self.dirty = {}        # (日期, session) -> [收到时间]，等待写入暂存
+        self.server = None
+        self.tasks = []
+        self.deadline_tasks = []
+
+        # 恢复上次暂存的签到；以前某天没有提交的签到不算作今天的
+        today = date.today()
+        for session in SESSIONS:
+            present = system.index.ids_of(system.load_breakpoint(session, today))
+            if present:
+                self.present[(today, session)] = present
+
+    async def start(self):
+        # 先建立实时排行，第一次提交时不用再读取数据
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.system.live_board)
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.tasks.append(asyncio.create_task(self.flush_loop()))
+        self.tasks.append(asyncio.create_task(self.settings_loop()))
+        self.start_deadlines()
+        return self.server
+
+    def start_deadlines(self):
+        """按当前的timer设置启动（或重新启动）自动提交"""
+        for task in self.deadline_tasks:
+            task.cancel()
+        self.deadline_tasks = []
+        timer = self.system.setting.get('timer', {})
+        if timer.get('on', True):
+            for session in SESSIONS:
+                self.deadline_tasks.append(asyncio.create_task(self.deadline_loop(session, timer)))
+
+    async def settings_loop(self):
+        """Setting.yml修改后不用重启服务即可生效"""
+        while True:
+            await asyncio.sleep(SETTINGS_POLL_SECONDS)
+            loop = asyncio.get_running_loop()
+            changes = await loop.run_in_executor(self.executor, self.system.check_settings)
+            if not changes or 'error' in changes:
+                continue
+            if 'arrival' in changes['changed']:
+                self.calendar = ArrivalCalendar.from_setting(self.system.setting)
+            if 'timer' in changes['changed']:
+                self.start_deadlines()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        for task in self.tasks + self.deadline_tasks:
+            task.cancel()
+        await self.flush()
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown()
+
+    async def handle_client(self, reader, writer):
+        """一个签到点的连接，逐行处理请求"""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # 一行超过了长度限制，剩下的内容无法再按行对齐，回复后断开
+                    await self.reply(writer, {'ok': False, 'error': "请求过长"})
+                    break
+                if not line:
+                    break
+                started = time.monotonic()
+                try:
+                    request = json.loads(line)
+                    response = await self.dispatch(request)
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                except Exception as e:
+                    # 例如写入数据失败，回复错误而不是断开签到点
+                    response = {'ok': False, 'error': f"处理请求时出错: {e!r}"}
+                await self.reply(writer, response)
+                self.stats.request_latency.append(time.monotonic() - started)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def reply(self, writer, response):
+        writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def dispatch(self, request):
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': "请求必须是JSON对象"}
+        op = request.get('op', 'checkin')
+        if op == 'checkin':
+            return self.checkin(request['name'], request.get('location', 'classroom'),
+                                request.get('time'))
+        if op == 'submit':
+            day = date.fromisoformat(request['date']) if 'date' in request else date.today()
+            return await self.submit(request['session'], day)
+        if op == 'stats':
+            return {'ok': True, 'stats': self.stats.to_dict()}
+        raise ValueError(f"未知操作: {op}")
+
+    def checkin(self, name, location='classroom', timestamp=None):
+        """处理一次签到：判定是否早到，并按学生/session/日期去重"""
+        self.stats.received += 1
+        sid = self.system.index.id_of(name)
+        if sid is None:
+            self.stats.rejected += 1
+            return {'ok': False, 'error': f"名单中没有{name}"}
+
+        day, session, early = self.calendar.classify(timestamp or datetime.now(), location)
+        key = (day, session)
+        if key in self.submitted or key in self.submitting:
+            self.stats.rejected += 1
+            return {'ok': False, 'error': f"{day} {session}已提交"}
+        if not early:
+            self.stats.late += 1
+            return {'ok': True, 'early': False, 'session': session}
+
+        present = self.present.setdefault(key, set())
+        if sid in present:
+            self.stats.duplicates += 1
+            return {'ok': True, 'early': True, 'duplicate': True, 'session': session}
+        present.add(sid)
+        self.dirty.setdefault(key, []).append(time.monotonic())
+        self.stats.accepted += 1
+        return {'ok': True, 'early': True, 'duplicate': False, 'session': session}
+
+    def names_of(self, key):
+        name_of = self.system.index.name_of
+        return sorted(name_of(sid) for sid in self.present.get(key, ()))
+
+    async def flush(self):
+        """把有变化的session写入暂存，每个session每个窗口只写一次"""
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, {}
+        loop = asyncio.get_running_loop()
+        latest = {}
+        for day, session in dirty:
+            # 暂存只按session区分，同一session只保留最新一天
+            if session not in latest or day > latest[session]:
+                latest[session] = day
+        for session, day in latest.items():
+            if (day, session) in self.submitted or (day, session) in self.submitting:
+                continue
+            names = self.names_of((day, session))
+            await loop.run_in_executor(self.executor, self.system.save_breakpoint, session, names, day)
+        now = time.monotonic()
+        for received in dirty.values():
+            self.stats.durable_latency.extend(now - t for t in received)
+        self.stats.flushes += 1
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def submit(self, session, day):
+        """记录某天某个session的考勤，并清除暂存"""
+        if session not in SESSIONS:
+            raise ValueError(f"未知的session: {session}")
+        key = (day, session)
+        if key in self.submitted or key in self.submitting:
+            return {'ok': False, 'error': f"{day} {session}已提交"}
+        names = self.names_of(key)
+        self.submitting.add(key)
+
+        loop = asyncio.get_running_loop()
+        try:
+            scores = await loop.run_in_executor(
+                self.executor, self.system.record_attendance, session, names, day)
+        except Exception:
+            # 没有记录成功：保留签到，重新写入暂存，之后可以再次提交
+            self.stats.failed_submits += 1
+            self.dirty.setdefault(key, []).append(time.monotonic())
+            raise
+        finally:
+            self.submitting.discard(key)
+        self.submitted.add(key)
+        self.dirty.pop(key, None)
+        self.present.pop(key, None)
+        await loop.run_in_executor(self.executor, self.system.clear_breakpoint, session)
+        self.stats.submits += 1
+        return {'ok': True, 'recorded': len(names), 'students': len(scores)}
+
+    async def deadline_loop(self, session, timer):
+        """每天到timer设定的时间自动提交"""
+        default = '7:05' if session == "morning" else '13:05'
+        seconds = parse_clock(timer.get(session, default))
+        while True:
+            now = datetime.now()
+            target = datetime.combine(now.date(), datetime.min.time()) + timedelta(seconds=seconds)
+            if target <= now:
+                target += timedelta(days=1)
+            await asyncio.sleep((target - now).total_seconds())
+            if self.present.get((target.date(), session)):
+                try:
+                    await self.submit(session, target.date())
+                except Exception:
+                    # 出错时不结束自动提交，签到仍保留在暂存中
+                    print(f"{target.date()} {session}自动提交失败:", file=sys.stderr)
+                    traceback.print_exc()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本机签到服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--flush', type=float, default=1.0, help="写入暂存的间隔（秒）")
+    args = parser.parse_args(argv)
+
+    server = CheckinServer(AttendanceSystem(), args.host, args.port, args.flush)
+    print(f"签到服务已启动: {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats.to_dict(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""本周实时排行：每次记录考勤后只更新分数有变化的学生
+
+排行按(总分从高到低, 名单顺序)保存在有序列表中，用二分查找定位和插入，
+与生成周报时的排名一致。每次变化后写入reports/leaderboard_live.json，
+命令行查看时只读这个文件，不读取eggs/中的数据，也不会重置本周。
+
+用法：
+    python leaderboard.py --top 10
+"""
+import argparse
+import bisect
+import json
+from datetime import datetime
+
+from common import SESSIONS, atomic_write_json
+
+
+class LiveLeaderboard:
+    """按总分排序的实时排行"""
+
+    def __init__(self, path, names, rules, points):
+        self.path = path
+        self.rules = rules
+        self.points = points
+        self.position = {name: i for i, name in enumerate(names)}
+        self.empty = (0,) * len(rules.keys)
+        self.counts = {session: {} for session in SESSIONS}  # session -> {姓名: 各档次数}
+        self.totals = {}   # 姓名 -> 总分
+        self.order = []    # 排好序的(-总分, 名单中的位置, 姓名)
+
+    def load(self, scores):
+        """scores为{session: {姓名: 各档次数}}，整体建立排行"""
+        for session in SESSIONS:
+            self.counts[session] = dict(scores.get(session, {}))
+        self.totals = {name: self._total(name) for name in self.position}
+        self.order = sorted((-total, self.position[name], name) for name, total in self.totals.items())
+        self.save()
+
+    def _total(self, name):
+        counts = zip(self.counts["morning"].get(name, self.empty), self.counts["afternoon"].get(name, self.empty))
+        return self.rules.points([m + a for m, a in counts], self.points)
+
+    def update(self, session, scores):
+        """一个session记录考勤后更新，返回总分有变化的学生"""
+        changed = []
+        counts = self.counts[session]
+        for name, new in scores.items():
+            if counts.get(name, self.empty) == tuple(new) or name not in self.position:
+                continue
+            counts[name] = tuple(new)
+            old, total = self.totals[name], self._total(name)
+            if total == old:
+                continue
+            # 只移动这一个学生：二分找到旧位置删除，再插入新位置
+            key = (-old, self.position[name], name)
+            del self.order[bisect.bisect_left(self.order, key)]
+            bisect.insort(self.order, (-total, self.position[name], name))
+            self.totals[name] = total
+            changed.append(name)
+        if changed:
+            self.save()
+        return changed
+
+    def ranking(self, top=None):
+        """产出(排名, 姓名, 总分)"""
+        for rank, (negative, _, name) in enumerate(self.order[:top] if top else self.order, 1):
+            yield rank, name, -negative
+
+    def rank_of(self, name):
+        """某个学生当前的排名，不在名单中时返回None"""
+        if name not in self.totals:
+            return None
+        return bisect.bisect_left(self.order, (-self.totals[name], self.position[name], name)) + 1
+
+    def save(self):
+        """写入排行文件，供命令行查看"""
+        atomic_write_json(self.path, {
+            'updated': datetime.now().isoformat(timespec='seconds'),
+            'rows': [[rank, name, total] for rank, name, total in self.ranking()],
+        }, separators=(',', ':'))
+
+
+def read_ranking(path):
+    """读取排行文件，返回(更新时间, [(排名, 姓名, 总分)])；还没有排行时返回(None, [])"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None, []
+    return data['updated'], [tuple(row) for row in data['rows']]
+
+
+def main(argv=None):
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="查看本周实时排行")
+    parser.add_argument('--top', type=int, help="只显示前N名")
+    parser.add_argument('--root', default='.', help="班级目录，默认为当前目录")
+    args = parser.parse_args(argv)
+
+    updated, rows = read_ranking(Path(args.root)/'reports'/'leaderboard_live.json')
+    if updated is None:
+        print("本周还没有考勤记录")
+        return
+    print(f"更新时间: {updated}")
+    for rank, name, total in rows[:args.top] if args.top else rows:
+        print(f"{rank}\t{name}\t{total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""性能统计：记录各操作的耗时和读写字节数，定期写入Prometheus格式的文本文件
+
+在Setting.yml中打开（或设置环境变量EARLY_BIRD_METRICS=1）：
+    metrics:
+      enabled: true
+      file: reports/metrics.prom   # 文本文件，可由node_exporter的textfile收集器读取
+      interval: 15                 # 最多每隔几秒写一次
+      trace: eggs/trace.jsonl      # 可选，每次调用写一行
+
+关闭时不会包装任何方法，没有额外开销。
+"""
+import atexit
+import functools
+import json
+import os
+import time
+
+from common import atomic_open
+
+PREFIX = 'early_bird'
+
+
+class Metrics:
+    """计时、字节计数和导出"""
+
+    def __init__(self, path, interval=15, trace_path=None):
+        self.path = path
+        self.interval = interval
+        self.spans = {}   # 操作 -> [次数, 总耗时, 最长耗时]
+        self.bytes = {'read': 0, 'written': 0}
+        self.last_export = 0.0
+        self.trace = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+        atexit.register(self.close)
+
+    @classmethod
+    def from_setting(cls, setting, cwd):
+        """按设置创建，未开启时返回None"""
+        config = setting.get('metrics') or {}
+        if not (config.get('enabled') or os.environ.get('EARLY_BIRD_METRICS')):
+            return None
+        trace = config.get('trace')
+        return cls(cwd/config.get('file', 'reports/metrics.prom'), config.get('interval', 15),
+                   trace and cwd/trace)
+
+    def instrument(self, obj, names, prefix=''):
+        """把obj的这些方法替换为计时的版本（只影响这个对象）"""
+        for name in names:
+            setattr(obj, name, self._wrap(prefix + name, getattr(obj, name)))
+
+    def _wrap(self, op, func):
+        @functools.wraps(func)
+        def span(*args, **kwargs):
+            read, written = self.bytes['read'], self.bytes['written']
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(op, time.perf_counter() - started,
+                             self.bytes['read'] - read, self.bytes['written'] - written)
+        return span
+
+    def count_bytes(self, direction, n):
+        """direction为read或written"""
+        self.bytes[direction] += n
+
+    def observe(self, op, seconds, read=0, written=0):
+        stat = self.spans.get(op)
+        if stat is None:
+            stat = self.spans[op] = [0, 0.0, 0.0]
+        stat[0] += 1
+        stat[1] += seconds
+        if seconds > stat[2]:
+            stat[2] = seconds
+        if self.trace is not None:
+            self.trace.write(json.dumps({
+                'ts': round(time.time(), 3),
+                'op': op,
+                'ms': round(seconds * 1000, 3),
+                'read': read,
+                'written': written,
+            }) + '\n')
+            self.trace.flush()
+        if time.monotonic() - self.last_export >= self.interval:
+            self.export()
+
+    def render(self):
+        """Prometheus文本格式"""
+        lines = [
+            f"# HELP {PREFIX}_op_seconds 各操作的耗时",
+            f"# TYPE {PREFIX}_op_seconds summary",
+        ]
+        for op, (count, total, _) in sorted(self.spans.items()):
+            lines.append(f'{PREFIX}_op_seconds_count{{op="{op}"}} {count}')
+            lines.append(f'{PREFIX}_op_seconds_sum{{op="{op}"}} {total:.6f}')
+        lines += [
+            f"# HELP {PREFIX}_op_seconds_max 各操作最长的一次耗时",
+            f"# TYPE {PREFIX}_op_seconds_max gauge",
+        ]
+        for op, (_, _, longest) in sorted(self.spans.items()):
+            lines.append(f'{PREFIX}_op_seconds_max{{op="{op}"}} {longest:.6f}')
+        lines += [
+            f"# HELP {PREFIX}_io_bytes_total 数据文件读写的字节数",
+            f"# TYPE {PREFIX}_io_bytes_total counter",
+        ]
+        for direction, n in self.bytes.items():
+            lines.append(f'{PREFIX}_io_bytes_total{{direction="{direction}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """先写临时文件再替换，收集器不会读到写了一半的文件"""
+        self.last_export = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(self.path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+
+    def close(self):
+        if self.spans:
+            self.export()
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
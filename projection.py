@@ -0,0 +1,179 @@
+"""预测本周结束时的分数
+
+每个学生的到场概率按保存的考勤记录估计（(到场天数+1)/(记录天数+2)），
+考虑本周剩下每次考勤到与没到的情况，按计分规则算出周末时的分数，给出每个学生和全班的
+期望值与分位数。对每个学生精确枚举剩下几天的所有情况（一周最多2**7种），
+全班的分位数用正态近似。
+
+用法：
+    python projection.py
+    python projection.py --days 3 --top 20
+"""
+import argparse
+from datetime import date, timedelta
+
+from common import SESSIONS
+from weekly import week_key, week_range
+
+PERCENTILES = (10, 50, 90)
+
+
+def remaining_days(last_day, today=None, days=None):
+    """还要考勤的日期：从today（已记录过则从下一天）开始，默认到本周星期天，days指定时为days天"""
+    today = today or date.today()
+    start = today if last_day is None or last_day < today else last_day + timedelta(days=1)
+    if days is None:
+        days = (week_range(week_key(today))[1] - start).days + 1
+    return [start + timedelta(days=i) for i in range(max(0, days))]
+
+
+def arrival_probability(history):
+    """按记录估计到场概率，没有记录时为0.5"""
+    return (sum(history) + 1) / (len(history) + 2)
+
+
+def point_table(rules, points):
+    """长度为length的一段连续出勤最终计入的分数"""
+    return [sum(times * points[rules.keys[k]] for k, times in award) for award in rules.award]
+
+
+def _run_points(bits, kinds, value):
+    """一个学生窗口内的分数，与StreakRules.evaluate的结果相同"""
+    total = 0
+    run = 0
+    for bit, kind in zip(bits, kinds):
+        if kind == 'skip' or (kind == 'extend' and not bit):
+            continue
+        if bit:
+            run += 1
+        elif run:
+            total += value[run]
+            run = 0
+    return total + value[run]
+
+
+class SessionModel:
+    """一个session的模拟输入：每个学生窗口内已知的几天、到场概率和每一天的处理方式"""
+
+    def __init__(self, system, session, future):
+        rules = system.rules
+        students = system.load_student_data(session)
+        names = system.setting['namelist']
+        histories = [list(students[name].history) if name in students else [] for name in names]
+        self.probs = [arrival_probability(h) for h in histories]
+
+        # 右对齐后取最后window天，左侧补缺勤不影响连续段
+        width = min(rules.window, max(map(len, histories), default=0) + len(future))
+        self.future = min(len(future), width)
+        known = width - self.future
+        self.known = [([False] * known + h)[-known:] if known else [] for h in histories]
+
+        # 窗口内每一天的处理方式：count、skip或extend
+        self.kinds = ['count'] * width
+        if rules.weekends != 'count':
+            past = system.recent_weekends(session, known) if known else []
+            weekend = [False] * (known - len(past)) + past + [day.weekday() >= 5 for day in future[:self.future]]
+            self.kinds = [rules.weekends if w else 'count' for w in weekend]
+        self.value = point_table(rules, system.setting['points'])
+
+    def current(self, i):
+        """第i个学生现在的分数（只看已知的几天）"""
+        known = len(self.known[i])
+        return _run_points(self.known[i], self.kinds[:known], self.value)
+
+    def distribution(self, i):
+        """第i个学生本session最终分数的精确分布{分数: 概率}"""
+        kinds = self.kinds
+        p = self.probs[i]
+        dist = {}
+        for outcome in range(1 << self.future):
+            future = [bool(outcome >> d & 1) for d in range(self.future)]
+            hits = sum(future)
+            prob = p ** hits * (1 - p) ** (self.future - hits)
+            total = _run_points(self.known[i] + future, kinds, self.value)
+            dist[total] = dist.get(total, 0) + prob
+        return dist
+
+
+def _percentile(dist, q):
+    """离散分布的q分位数：累计概率第一次达到q%的分数"""
+    acc = 0
+    for points in sorted(dist):
+        acc += dist[points]
+        if acc >= q / 100 - 1e-12:
+            return points
+    return max(dist)
+
+
+def _convolve(a, b):
+    dist = {}
+    for x, px in a.items():
+        for y, py in b.items():
+            dist[x + y] = dist.get(x + y, 0) + px * py
+    return dist
+
+
+def project_week(system, today=None, days=None, percentiles=PERCENTILES):
+    """预测本周结束时的分数
+
+    days指定时假设每个session还剩days次考勤，否则按记录到的最后一天算到星期天。
+    返回{'days', 'students': {姓名: {'current', 'expected', 'p10', ...}}, 'class': {...}}
+    """
+    today = today or date.today()
+    models = {}
+    remaining = {}
+    for session in SESSIONS:
+        term = system.term_history(session)
+        last = date.fromordinal(term.days[-1]) if term.days else None
+        future = remaining_days(last, today, days)
+        remaining[session] = len(future)
+        models[session] = SessionModel(system, session, future)
+
+    students, group = _project_exact(models, system.setting['namelist'], percentiles)
+    return {'days': remaining, 'students': students, 'class': group}
+
+
+def _project_exact(models, names, percentiles):
+    from statistics import NormalDist
+
+    students = {}
+    mean = variance = 0
+    for i, name in enumerate(names):
+        dist = {0: 1.0}
+        for model in models.values():
+            dist = _convolve(dist, model.distribution(i))
+        expected = sum(v * p for v, p in dist.items())
+        mean += expected
+        variance += sum((v - expected) ** 2 * p for v, p in dist.items())
+        row = {'current': sum(model.current(i) for model in models.values()), 'expected': expected}
+        for q in percentiles:
+            row[f'p{q}'] = _percentile(dist, q)
+        students[name] = row
+    # 学生之间相互独立，全班总分近似正态分布
+    group = {'current': sum(row['current'] for row in students.values()), 'expected': mean}
+    for q in percentiles:
+        group[f'p{q}'] = NormalDist(mean, variance ** 0.5).inv_cdf(q / 100) if variance else mean
+    return students, group
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="预测本周结束时的分数")
+    parser.add_argument('--days', type=int, help="每个session还剩几次考勤，默认算到星期天")
+    parser.add_argument('--top', type=int, help="只显示期望分数最高的N名")
+    args = parser.parse_args(argv)
+
+    from core import AttendanceSystem
+
+    result = project_week(AttendanceSystem(), days=args.days)
+    bands = [f'p{q}' for q in PERCENTILES]
+    print(f"剩余考勤: 上午{result['days']['morning']}次, 下午{result['days']['afternoon']}次")
+    print("姓名\t当前\t期望\t" + "\t".join(q.upper() for q in bands))
+    rows = sorted(result['students'].items(), key=lambda item: item[1]['expected'], reverse=True)
+    for name, row in rows[:args.top] if args.top else rows:
+        print(f"{name}\t{row['current']:g}\t{row['expected']:.2f}\t" + "\t".join(f"{row[q]:g}" for q in bands))
+    group = result['class']
+    print(f"全班\t{group['current']:g}\t{group['expected']:.2f}\t" + "\t".join(f"{group[q]:.1f}" for q in bands))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""汇总报告：逐行生成并直接写入文件，支持Markdown、CSV和HTML
+
+用法（不会重置数据，加--reset才会像周报一样开始新的一周）：
+    python report.py --format html --top 50
+    python report.py --format csv
+"""
+import argparse
+import csv
+import heapq
+import html
+
+
+def ranked_rows(scores, top=None):
+    """scores是(姓名, 总分)的可迭代对象，产出(排名, 姓名, 总分)
+
+    top指定时用大小为top的堆筛选前top名，不需要把整个名单排序；
+    同分时保持名单中的先后顺序。
+    """
+    def by_score(item):
+        return item[1]
+
+    if top:
+        ranked = heapq.nlargest(top, scores, key=by_score)
+    else:
+        ranked = sorted(scores, key=by_score, reverse=True)
+    for rank, (name, score) in enumerate(ranked, 1):
+        yield rank, name, score
+
+
+class MarkdownRenderer:
+    """Markdown表格，每行放display.md.column_num列（每个学生占排名、姓名、总分3列）"""
+
+    extension = 'md'
+    encoding = 'utf-8'
+
+    def __init__(self, column_num=3):
+        self.per_line = max(1, column_num // 3)
+        self.pending = []
+
+    def begin(self, f, meta):
+        self.f = f
+        f.write("# 考勤汇总报告\n\n")
+        f.write(f"**生成时间**: {meta['timestamp']}  \n")
+        if meta['reset']:
+            f.write("**本周结束，开始新的一周**\n")
+        title = f"本周前{meta['top']}名" if meta['top'] else "本周最终分数统计"
+        f.write(f"\n## {title}\n\n")
+        f.write("|" + " 排名 | 姓名 | 总分 |" * self.per_line + "\n")
+        f.write("|" + "------|------|------|" * self.per_line + "\n")
+
+    def row(self, rank, name, score):
+        self.pending.append(f" {rank} | {name} | **{score}** |")
+        if len(self.pending) == self.per_line:
+            self._flush_line()
+
+    def _flush_line(self):
+        cells = self.pending + ["  |  |  |"] * (self.per_line - len(self.pending))
+        self.f.write("|" + "".join(cells) + "\n")
+        self.pending = []
+
+    def end(self, meta):
+        if self.pending:
+            self._flush_line()
+        f = self.f
+        if meta['tiers']:
+            f.write("\n\n## 分数说明\n\n")
+            for text, points in meta['tiers']:
+                f.write(f"- {text}: {points}分/次\n")
+        if meta['reset']:
+            f.write("\n## 注意\n\n本周考勤数据已重置，下周将重新开始统计。\n")
+
+
+class CsvRenderer:
+    """CSV，带BOM方便Excel直接打开"""
+
+    extension = 'csv'
+    encoding = 'utf-8-sig'
+
+    def begin(self, f, meta):
+        self.writer = csv.writer(f)
+        self.writer.writerow(["排名", "姓名", "总分"])
+
+    def row(self, rank, name, score):
+        self.writer.writerow([rank, name, score])
+
+    def end(self, meta):
+        pass
+
+
+class HtmlRenderer:
+    """单个HTML文件"""
+
+    extension = 'html'
+    encoding = 'utf-8'
+
+    def begin(self, f, meta):
+        self.f = f
+        title = f"本周前{meta['top']}名" if meta['top'] else "本周最终分数统计"
+        f.write('<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="utf-8">\n')
+        f.write('<title>考勤汇总报告</title>\n</head>\n<body>\n<h1>考勤汇总报告</h1>\n')
+        f.write(f"<p><strong>生成时间</strong>: {html.escape(meta['timestamp'])}</p>\n")
+        if meta['reset']:
+            f.write("<p><strong>本周结束，开始新的一周</strong></p>\n")
+        f.write(f"<h2>{title}</h2>\n<table>\n<tr><th>排名</th><th>姓名</th><th>总分</th></tr>\n")
+
+    def row(self, rank, name, score):
+        self.f.write(f"<tr><td>{rank}</td><td>{html.escape(name)}</td><td><strong>{score}</strong></td></tr>\n")
+
+    def end(self, meta):
+        f = self.f
+        f.write("</table>\n")
+        if meta['tiers']:
+            f.write("<h2>分数说明</h2>\n<ul>\n")
+            for text, points in meta['tiers']:
+                f.write(f"<li>{text}: {points}分/次</li>\n")
+            f.write("</ul>\n")
+        if meta['reset']:
+            f.write("<h2>注意</h2>\n<p>本周考勤数据已重置，下周将重新开始统计。</p>\n")
+        f.write("</body>\n</html>\n")
+
+
+def make_renderer(fmt, setting):
+    """按格式创建渲染器"""
+    if fmt == 'md':
+        return MarkdownRenderer(setting.get('display', {}).get('md', {}).get('column_num', 3))
+    if fmt == 'csv':
+        return CsvRenderer()
+    if fmt == 'html':
+        return HtmlRenderer()
+    raise ValueError(f"未知的报告格式: {fmt}")
+
+
+def write_report(path, rows, renderer, meta):
+    """把(排名, 姓名, 总分)逐行写入文件"""
+    with open(path, 'w', encoding=renderer.encoding, newline='') as f:
+        renderer.begin(f, meta)
+        for rank, name, score in rows:
+            renderer.row(rank, name, score)
+        renderer.end(meta)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成汇总报告")
+    parser.add_argument('--format', choices=['md', 'csv', 'html'], default='md')
+    parser.add_argument('--top', type=int, help="只输出前N名")
+    parser.add_argument('--reset', action='store_true', help="生成后重置数据，开始新的一周")
+    args = parser.parse_args(argv)
+
+    from core import AttendanceSystem
+
+    report_file = AttendanceSystem().generate_summary_report(fmt=args.format, top=args.top, reset=args.reset)
+    print(report_file)
+
+
+if __name__ == "__main__":
+    main()
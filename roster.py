@@ -0,0 +1,256 @@
+"""班级级别的考勤矩阵：天 × 学生的位图存储，整班一次性计算连续出勤分数"""
+import json
+
+from common import atomic_write_json
+
+
+def _add_mask(planes, mask):
+    """按位切片计数器：给mask中置位的学生各加1"""
+    carry = mask
+    for i, plane in enumerate(planes):
+        if not carry:
+            return
+        planes[i] = plane ^ carry
+        carry = plane & carry
+    if carry:
+        planes.append(carry)
+
+
+def _planes_to_counts(planes, n):
+    """把位切片计数器展开为每个学生的整数计数"""
+    counts = [0] * n
+    for k, plane in enumerate(planes):
+        if not plane:
+            continue
+        # 低位在前的二进制串，第i个字符对应第i个学生
+        bits = bin(plane)[2:].zfill(n)[::-1]
+        weight = 1 << k
+        for i in range(n):
+            if bits[i] == '1':
+                counts[i] += weight
+    return counts
+
+
+def _indices_to_mask(indices, n):
+    """把一组学生下标转换为位图
+
+    先在bytearray中置位再一次转换成整数；逐个|=会每次重新生成一个n位的整数，整班是O(n²)。
+    """
+    buf = bytearray((n + 7) // 8)
+    for i in indices:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _counts_to_planes(counts):
+    """把每个学生的整数计数压缩为位切片计数器"""
+    depth = max(counts, default=0).bit_length()
+    return [_indices_to_mask([i for i, count in enumerate(counts) if count >> k & 1], len(counts))
+            for k in range(depth)]
+
+
+def _exact_runs(window, max_length):
+    """找出窗口内所有恰好长度为length的连续段，产出(length, 位图)
+
+    对每个结束日t向前延伸，一次位运算覆盖全班；同一长度可能产出多次。
+    """
+    n = len(window)
+    for t in range(n):
+        # 连续段必须在t结束：第二天缺勤或已是最后一天
+        acc = window[t] if t == n - 1 else window[t] & ~window[t + 1]
+        for length in range(1, min(t + 1, max_length) + 1):
+            if length > 1:
+                acc &= window[t - length + 1]
+            if not acc:
+                break
+            # 连续段必须在t-length+1开始：前一天缺勤或已是第一天
+            start = t - length + 1
+            exact = acc if start == 0 else acc & ~window[start - 1]
+            if exact:
+                yield length, exact
+
+
+class RosterMatrix:
+    """整班考勤矩阵
+
+    每一天是一个整数位图，第i位表示第i个学生当天是否早到。
+    所有统计都用整数位运算完成，一次运算覆盖全班学生。
+    """
+
+    def __init__(self, names, max_days=7):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.max_days = max_days
+        self.rows = []           # 最近max_days*2天的位图，与ContinuousScoring.history对齐
+        self.streak_planes = []  # 当前连续出勤天数（位切片计数器）
+        self.current_day = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_student(self, name):
+        """追加一名学生，历史记录视为缺勤"""
+        if name not in self.index:
+            self.index[name] = len(self.names)
+            self.names.append(name)
+        return self.index[name]
+
+    def mask_of(self, present_students):
+        """把到场学生名单转换为位图，未知名字会被忽略"""
+        index = self.index
+        found = [index[name] for name in present_students if name in index]
+        return _indices_to_mask(found, len(self.names))
+
+    def record_day(self, present_students):
+        """记录全班一天的考勤"""
+        self.record_mask(self.mask_of(present_students))
+
+    def record_mask(self, mask):
+        """以位图形式记录全班一天的考勤"""
+        self.rows.append(mask)
+        if len(self.rows) > self.max_days * 2:
+            del self.rows[:-self.max_days * 2]
+
+        # 到场的学生连续天数+1，缺勤的清零
+        _add_mask(self.streak_planes, mask)
+        self.streak_planes = [plane & mask for plane in self.streak_planes]
+        while self.streak_planes and not self.streak_planes[-1]:
+            self.streak_planes.pop()
+
+        self.current_day += 1
+
+    def calculate_scores(self):
+        """计算全班3天和7天连续出勤次数，结果与ContinuousScoring.calculate_scores一致"""
+        _3_planes = []
+        _7_planes = []
+        for length, exact in _exact_runs(self.rows[-self.max_days:], 7):
+            if length == 7:
+                _add_mask(_7_planes, exact)
+            elif length >= 3:
+                _add_mask(_3_planes, exact)
+
+        n_students = len(self.names)
+        _3_counts = _planes_to_counts(_3_planes, n_students)
+        _7_counts = _planes_to_counts(_7_planes, n_students)
+        return {name: (_3_counts[i], _7_counts[i]) for i, name in enumerate(self.names)}
+
+    def current_streaks(self):
+        """获取全班当前连续出勤天数"""
+        counts = _planes_to_counts(self.streak_planes, len(self.names))
+        return dict(zip(self.names, counts))
+
+    def history_of(self, name):
+        """获取某个学生保留的历史出勤记录"""
+        bit = 1 << self.index[name]
+        return [bool(row & bit) for row in self.rows]
+
+    def reset_data(self):
+        """重置数据，开始新的一周"""
+        self.rows = []
+        self.streak_planes = []
+        self.current_day = 0
+
+    @classmethod
+    def from_students(cls, students, names=None, max_days=7):
+        """从{姓名: ContinuousScoring}构建矩阵，历史记录按最近一天右对齐"""
+        names = list(names) if names is not None else list(students)
+        known = set(names)
+        names.extend(name for name in students if name not in known)
+
+        matrix = cls(names, max_days)
+        depth = max((len(s.history) for s in students.values()), default=0)
+        # 每天先收集到场学生的下标，最后每天只生成一次整数
+        rows = [[] for _ in range(depth)]
+        streaks = [0] * len(names)
+        for name, student in students.items():
+            i = matrix.index[name]
+            offset = depth - len(student.history)
+            for d, arrived in enumerate(student.history):
+                if arrived:
+                    rows[offset + d].append(i)
+            streaks[i] = student.get_current_streak()
+
+        matrix.rows = [_indices_to_mask(row, len(names)) for row in rows[-max_days * 2:]]
+        matrix.streak_planes = _counts_to_planes(streaks)
+        matrix.current_day = max((s.current_day for s in students.values()), default=0)
+        return matrix
+
+    def iter_students(self):
+        """逐个产出(姓名, 历史记录, 当前连续天数)，用于写回ContinuousScoring"""
+        streaks = _planes_to_counts(self.streak_planes, len(self.names))
+        for i, name in enumerate(self.names):
+            bit = 1 << i
+            yield name, [bool(row & bit) for row in self.rows], streaks[i]
+
+
+class RosterIndex:
+    """学生名单索引：为每个名字分配稳定的整数ID
+
+    数据文件以ID为键保存，改名只需修改这里的映射，历史记录不会丢失。
+    索引保存在eggs/roster.json。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.names = {}   # ID -> 姓名
+        self.ids = {}     # 姓名 -> ID
+        self.next_id = 0
+        self.dirty = False
+        if path is not None and path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.next_id = data.get('next_id', 0)
+            for sid, name in data.get('students', {}).items():
+                self.names[int(sid)] = name
+                self.ids[name] = int(sid)
+
+    def intern(self, name):
+        """获取名字对应的ID，新名字会分配一个新ID"""
+        sid = self.ids.get(name)
+        if sid is None:
+            sid = self.next_id
+            self.next_id += 1
+            self.ids[name] = sid
+            self.names[sid] = name
+            self.dirty = True
+        return sid
+
+    def rename(self, old, new):
+        """把old的ID转给new；已经改过名的情况下什么也不做"""
+        if old not in self.ids or new in self.ids:
+            return
+        sid = self.ids.pop(old)
+        self.ids[new] = sid
+        self.names[sid] = new
+        self.dirty = True
+
+    def sync(self, namelist, renames=None):
+        """按设置中的名单和改名表更新索引，返回名单对应的ID列表"""
+        for old, new in (renames or {}).items():
+            self.rename(old, new)
+        sids = [self.intern(name) for name in namelist]
+        self.save()
+        return sids
+
+    def id_of(self, name):
+        """获取名字对应的ID，未知名字返回None"""
+        return self.ids.get(name)
+
+    def ids_of(self, names):
+        """把名字集合转换为ID集合，未知名字会被忽略"""
+        ids = self.ids
+        return {ids[name] for name in names if name in ids}
+
+    def name_of(self, sid):
+        """获取ID对应的当前名字"""
+        return self.names[sid]
+
+    def save(self):
+        """有改动时写回索引文件"""
+        if not self.dirty or self.path is None:
+            return
+        atomic_write_json(self.path, {
+            'next_id': self.next_id,
+            'students': {str(sid): name for sid, name in sorted(self.names.items())},
+        }, indent=2)
+        self.dirty = False
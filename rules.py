@@ -0,0 +1,146 @@
+"""连续早到计分规则：从Setting.yml的rules编译成按连续段长度查表的状态机
+
+    rules:
+      window: 7          # 只看最近几次考勤（最多14）
+      mode: highest      # highest: 每段连续只按能达到的最高一档计一次；all: 符合的每一档都计
+      weekends: count    # count: 周末与平时相同；skip: 忽略周末的记录；extend: 周末到了算连续，没到不打断
+      tiers:             # points是points中对应的分数项
+      - {points: _3_days, min: 3, max: 6}
+      - {points: _7_days, min: 7, max: 7}
+
+某一档加上repeat: true时，一段连续按min天计一次，可以计多次。
+不写rules时就是上面的默认规则，与原来的3天/7天计分完全一致。
+"""
+from roster import _add_mask, _exact_runs, _planes_to_counts
+
+MAX_WINDOW = 14  # ContinuousScoring只保留最近14天
+DEFAULT_TIERS = [
+    {'points': '_3_days', 'min': 3, 'max': 6},
+    {'points': '_7_days', 'min': 7, 'max': 7},
+]
+
+
+class StreakRules:
+    """编译后的计分规则
+
+    award[长度]是这一段连续出勤应计入的[(第几档, 次数)]，
+    评估时一遍扫描出勤记录，每段连续结束时查一次表。
+    """
+
+    def __init__(self, tiers=None, mode='highest', window=7, weekends='count'):
+        tiers = DEFAULT_TIERS if tiers is None else tiers
+        if mode not in ('highest', 'all'):
+            raise ValueError(f"rules.mode只能是highest或all: {mode}")
+        if weekends not in ('count', 'skip', 'extend'):
+            raise ValueError(f"rules.weekends只能是count、skip或extend: {weekends}")
+        if not isinstance(window, int) or not 1 <= window <= MAX_WINDOW:
+            raise ValueError(f"rules.window必须是1到{MAX_WINDOW}之间的整数")
+        if not tiers:
+            raise ValueError("rules.tiers不能为空")
+
+        self.tiers = []
+        for tier in tiers:
+            try:
+                key, low = tier['points'], tier['min']
+            except (TypeError, KeyError):
+                raise ValueError(f"rules.tiers中的每一档都需要points和min: {tier}")
+            high = tier.get('max')
+            if not isinstance(low, int) or low < 1 or (high is not None and (not isinstance(high, int) or high < low)):
+                raise ValueError(f"rules.tiers中{key}的天数设置有误")
+            self.tiers.append((key, low, high, bool(tier.get('repeat', False))))
+        self.keys = [key for key, _, _, _ in self.tiers]
+        self.mode = mode
+        self.window = window
+        self.weekends = weekends
+        self.award = [self._compile(length) for length in range(window + 1)]
+
+    def _compile(self, length):
+        """长度为length的一段连续出勤应计入的各档次数"""
+        matched = [(k, low, repeat) for k, (_, low, high, repeat) in enumerate(self.tiers)
+                   if low <= length and (high is None or length <= high)]
+        if self.mode == 'highest' and matched:
+            matched = [max(matched, key=lambda m: m[1])]
+        return [(k, length // low if repeat else 1) for k, low, repeat in matched]
+
+    @classmethod
+    def from_setting(cls, setting):
+        """按设置编译规则，分数项缺失时抛出ValueError"""
+        config = setting.get('rules') or {}
+        rules = cls(config.get('tiers'), config.get('mode', 'highest'),
+                    config.get('window', 7), config.get('weekends', 'count'))
+        points = setting.get('points') or {}
+        for key in rules.keys:
+            if not isinstance(points.get(key), (int, float)):
+                raise ValueError(f"points.{key}必须是数字")
+        return rules
+
+    def is_default(self):
+        """是否就是原来的3天/7天规则，是的话可以直接用增量计数器"""
+        return (self.mode == 'highest' and self.window == 7 and self.weekends == 'count'
+                and self.tiers == [('_3_days', 3, 6, False), ('_7_days', 7, 7, False)])
+
+    def label(self, k):
+        """某一档的简称，例如3天"""
+        return f"{self.tiers[k][1]}天"
+
+    def describe(self):
+        """每一档的说明，用于报告"""
+        lines = []
+        for key, low, high, repeat in self.tiers:
+            if high == low:
+                text = f"连续出勤{low}天"
+            elif high is None:
+                text = f"连续出勤{low}天及以上"
+            else:
+                text = f"连续出勤{low}天及以上但不足{high + 1}天"
+            if repeat:
+                text += f"（每{low}天计一次）"
+            lines.append((key, text))
+        return lines
+
+    def points(self, counts, points):
+        """各档次数乘以对应的分数"""
+        return sum(n * points[key] for n, key in zip(counts, self.keys))
+
+    def _filter(self, bits, weekend):
+        """按周末规则整理出勤记录，只取最近window天"""
+        bits = list(bits)[-self.window:]
+        if weekend is None or self.weekends == 'count':
+            return bits
+        weekend = list(weekend)[-len(bits):]
+        weekend = [False] * (len(bits) - len(weekend)) + weekend
+        if self.weekends == 'skip':
+            return [bit for bit, w in zip(bits, weekend) if not w]
+        return [bit for bit, w in zip(bits, weekend) if bit or not w]
+
+    def evaluate(self, bits, weekend=None):
+        """一遍扫描一个学生的出勤记录，返回各档次数；weekend与bits对齐，标记哪些天是周末"""
+        counts = [0] * len(self.tiers)
+        award = self.award
+        run = 0
+        for bit in self._filter(bits, weekend) + [False]:
+            if bit:
+                run += 1
+            elif run:
+                for k, times in award[run]:
+                    counts[k] += times
+                run = 0
+        return tuple(counts)
+
+    def evaluate_roster(self, rows, n, weekend=None):
+        """整班评估：rows是每天的位图，返回每个学生的各档次数列表
+
+        周末规则为extend时每个学生要丢弃的天不同，逐个学生评估；
+        否则用位运算找出每种长度的连续段，一次覆盖全班。
+        """
+        if weekend is not None and self.weekends == 'extend':
+            return [self.evaluate([bool(row >> i & 1) for row in rows], weekend) for i in range(n)]
+
+        window = self._filter(rows, weekend)
+        planes = [[] for _ in self.tiers]
+        for length, mask in _exact_runs(window, self.window):
+            for k, times in self.award[length]:
+                for _ in range(times):
+                    _add_mask(planes[k], mask)
+        per_tier = [_planes_to_counts(p, n) for p in planes]
+        return [tuple(counts[i] for counts in per_tier) for i in range(n)]
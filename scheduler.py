@@ -0,0 +1,118 @@
+"""Tk事件循环里的统一定时器：所有自动提交和倒计时共用一个after()"""
+import heapq
+import itertools
+import math
+import time
+
+
+class TkScheduler:
+    """基于小根堆的定时器
+
+    所有任务按截止时间放在一个堆里，任何时刻只向Tk登记一个after()，
+    指向最早的截止时间。倒计时标签共用一个每秒一次的刷新，
+    窗口关闭时按owner一次性取消它的所有任务。
+    """
+
+    def __init__(self, root, clock=time.time):
+        self.root = root
+        self.clock = clock
+        self._heap = []           # (截止时间, token)
+        self._tokens = itertools.count()
+        self._jobs = {}           # token -> (回调, 参数, owner)
+        self._owners = {}         # owner -> {token}
+        self._tickers = {}        # owner -> [每秒刷新的回调]
+        self._tick_token = None
+        self._after_id = None
+        self._armed_at = None
+
+    def call_at(self, deadline, callback, *args, owner=None):
+        """在deadline（Unix时间戳）调用callback，返回可用于取消的token"""
+        token = next(self._tokens)
+        heapq.heappush(self._heap, (deadline, token))
+        self._jobs[token] = (callback, args, owner)
+        if owner is not None:
+            self._owners.setdefault(owner, set()).add(token)
+        self._arm()
+        return token
+
+    def call_later(self, delay, callback, *args, owner=None):
+        """delay秒后调用callback"""
+        return self.call_at(self.clock() + delay, callback, *args, owner=owner)
+
+    def cancel(self, token):
+        """取消一个任务；堆中的条目在到期时惰性丢弃"""
+        job = self._jobs.pop(token, None)
+        if job is not None and job[2] is not None:
+            self._owners.get(job[2], set()).discard(token)
+
+    def add_ticker(self, owner, callback):
+        """登记一个每秒调用一次的刷新回调callback(now)，并立即调用一次"""
+        self._tickers.setdefault(owner, []).append(callback)
+        callback(self.clock())
+        if self._tick_token is None:
+            self._schedule_tick()
+
+    def cancel_owner(self, owner):
+        """取消owner的所有任务和刷新回调，通常在窗口关闭时调用"""
+        for token in self._owners.pop(owner, ()):
+            self._jobs.pop(token, None)
+        self._tickers.pop(owner, None)
+        if not self._tickers and self._tick_token is not None:
+            self.cancel(self._tick_token)
+            self._tick_token = None
+        self._arm()
+
+    def pending(self):
+        """尚未执行的任务数"""
+        return len(self._jobs)
+
+    def _schedule_tick(self):
+        # 对齐到下一个整秒，所有倒计时在同一次回调里一起刷新
+        self._tick_token = self.call_at(math.floor(self.clock()) + 1, self._tick)
+
+    def _tick(self):
+        self._tick_token = None
+        now = self.clock()
+        for callbacks in list(self._tickers.values()):
+            for callback in callbacks:
+                callback(now)
+        if self._tickers:
+            self._schedule_tick()
+
+    def _arm(self):
+        """让唯一的after()指向最早的截止时间"""
+        heap = self._heap
+        while heap and heap[0][1] not in self._jobs:
+            heapq.heappop(heap)
+
+        if not heap:
+            if self._after_id is not None:
+                self.root.after_cancel(self._after_id)
+                self._after_id = None
+            return
+
+        deadline = heap[0][0]
+        if self._after_id is not None:
+            if self._armed_at <= deadline:
+                return
+            self.root.after_cancel(self._after_id)
+        delay = max(0, int((deadline - self.clock()) * 1000))
+        self._armed_at = deadline
+        self._after_id = self.root.after(delay, self._run)
+
+    def _run(self):
+        """执行所有到期的任务"""
+        self._after_id = None
+        now = self.clock()
+        try:
+            while self._heap and self._heap[0][0] <= now:
+                _, token = heapq.heappop(self._heap)
+                job = self._jobs.pop(token, None)
+                if job is None:
+                    continue
+                callback, args, owner = job
+                if owner is not None:
+                    self._owners.get(owner, set()).discard(token)
+                callback(*args)
+        finally:
+            self._arm()
@@ -0,0 +1,171 @@
+"""多个班级：每个班级一个目录（各自的bacon/、eggs/、reports/），由根目录的classes.json登记
+
+用法：
+    python school.py add 高一1班 --settings 高一1班.yml
+    python school.py list
+    python school.py report --format html --school-top 100 --reset
+
+report在进程池中并行生成每个班级的周报，再把所有学生合并成全校排行，
+保存到根目录的reports/全校排行_{时间}.{格式}；某个班级出错不影响其他班级。
+"""
+import argparse
+import json
+import shutil
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from common import atomic_write_json
+
+REGISTRY_VERSION = 1
+
+
+class ClassRegistry:
+    """班级登记表：root/classes.json，班级名 -> 相对于root的目录"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.path = self.root/'classes.json'
+        self.classes = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != REGISTRY_VERSION:
+                raise ValueError(f"不支持的classes.json版本: {data.get('version')}")
+            self.classes = data['classes']
+
+    def save(self):
+        atomic_write_json(self.path, {'version': REGISTRY_VERSION, 'classes': self.classes}, indent=2)
+
+    def add(self, name, path=None, settings=None):
+        """登记一个班级，默认目录为classes/{班级名}；settings为要复制过去的Setting.yml"""
+        if name in self.classes:
+            raise ValueError(f"班级已存在: {name}")
+        relative = Path(path) if path else Path('classes')/name
+        shard = self.root/relative
+        (shard/'bacon').mkdir(parents=True, exist_ok=True)
+        if settings:
+            shutil.copyfile(settings, shard/'bacon'/'Setting.yml')
+        self.classes[name] = relative.as_posix()
+        self.save()
+        return shard
+
+    def remove(self, name):
+        """取消登记，不删除班级目录"""
+        if name not in self.classes:
+            raise KeyError(f"没有这个班级: {name}")
+        del self.classes[name]
+        self.save()
+
+    def items(self):
+        """按登记顺序返回[(班级名, 目录)]"""
+        return [(name, self.root/path) for name, path in self.classes.items()]
+
+
+def _report_shard(root, now, fmt, top, reset):
+    """在子进程中生成一个班级的周报，出错时返回错误信息而不是抛出"""
+    try:
+        from core import AttendanceSystem
+
+        totals = []
+        report_file = AttendanceSystem(root).generate_summary_report(now, fmt, top, reset, collect=totals)
+        return str(report_file), totals, None
+    except Exception:
+        return None, [], traceback.format_exc()
+
+
+def report_all(registry, now=None, fmt='md', top=None, reset=False, workers=None, school_top=None):
+    """并行生成所有班级的周报和全校排行
+
+    返回(全校排行文件, {班级: 周报文件}, {班级: 错误信息})；所有班级都失败时没有全校排行文件。
+    """
+    from report import make_renderer, ranked_rows, write_report
+
+    now = now or datetime.now()
+    shards = registry.items()
+    reports, failures, scores = {}, {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_report_shard, str(path), now, fmt, top, reset): name
+                   for name, path in shards}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                report_file, totals, error = future.result()
+            except Exception as e:
+                # 子进程异常退出（例如被杀掉），整个进程池都会中断
+                report_file, totals, error = None, [], f"进程异常退出: {e!r}"
+            if error:
+                failures[name] = error
+            else:
+                reports[name] = report_file
+                scores[name] = totals
+
+    if not scores:
+        return None, reports, failures
+
+    def combined():
+        """按登记顺序合并，同分时保持班级和名单的先后"""
+        for name, _ in shards:
+            for student, total in scores.get(name, ()):
+                yield f"{name} {student}", total
+
+    renderer = make_renderer(fmt, {})
+    meta = {
+        'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'tiers': [],  # 各班级的计分规则可能不同，见各班级的周报
+        'top': school_top,
+        'reset': reset,
+    }
+    (registry.root/'reports').mkdir(exist_ok=True)
+    school_file = registry.root/'reports'/f'全校排行_{now.strftime("%Y%m%d_%H%M%S")}.{renderer.extension}'
+    write_report(school_file, ranked_rows(combined(), school_top), renderer, meta)
+    return school_file, reports, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多个班级的登记和批量周报")
+    parser.add_argument('--root', default='.', help="classes.json所在的目录，默认为当前目录")
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add', help="登记一个班级")
+    add.add_argument('name')
+    add.add_argument('--path', help="班级目录（相对于根目录），默认为classes/班级名")
+    add.add_argument('--settings', help="复制到班级目录的Setting.yml")
+    remove = sub.add_parser('remove', help="取消登记（不删除目录）")
+    remove.add_argument('name')
+    sub.add_parser('list', help="列出已登记的班级")
+    report = sub.add_parser('report', help="并行生成所有班级的周报和全校排行")
+    report.add_argument('--format', choices=['md', 'csv', 'html'], default='md')
+    report.add_argument('--top', type=int, help="每个班级的周报只输出前N名")
+    report.add_argument('--school-top', type=int, help="全校排行只输出前N名")
+    report.add_argument('--reset', action='store_true', help="生成后重置各班级数据，开始新的一周")
+    report.add_argument('--workers', type=int, help="进程数，默认为CPU核数")
+    args = parser.parse_args(argv)
+
+    registry = ClassRegistry(args.root)
+    if args.command == 'add':
+        print(registry.add(args.name, args.path, args.settings))
+    elif args.command == 'remove':
+        registry.remove(args.name)
+    elif args.command == 'list':
+        for name, path in registry.items():
+            print(f"{name}\t{path}")
+    else:
+        if not registry.classes:
+            print("还没有登记班级，先运行 python school.py add <班级名>")
+            return 1
+        school_file, reports, failures = report_all(registry, None, args.format, args.top, args.reset,
+                                                    args.workers, args.school_top)
+        for name, _ in registry.items():
+            if name in reports:
+                print(f"{name}\t{reports[name]}")
+            else:
+                print(f"{name}\t失败:\n{failures[name]}")
+        if school_file:
+            print(f"全校排行\t{school_file}")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""设置文件的读取、校验、缓存和修改检测
+
+校验后的设置以JSON保存在eggs/settings.cache，并记录Setting.yml的
+修改时间、大小和SHA-256。文件没变时直接读缓存，不需要导入PyYAML；
+修改时间变了但内容没变时只更新记录。SettingsWatcher用于运行中检测修改。
+"""
+import json
+from datetime import date, datetime
+
+from arrival import ArrivalCalendar, parse_clock
+from common import SESSIONS, atomic_write_json
+from rules import StreakRules
+
+CACHE_VERSION = 3  # 缓存格式或校验的内容变化时加一，旧缓存作废
+ENCODINGS = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+
+
+def validate_settings(setting):
+    """检查设置中必需的项，有问题时抛出ValueError"""
+    if not isinstance(setting, dict):
+        raise ValueError("Setting.yml的内容不是字典")
+    namelist = setting.get('namelist')
+    if not isinstance(namelist, list) or not namelist:
+        raise ValueError("Setting.yml中缺少namelist或名单为空")
+    seen = set()
+    for name in namelist:
+        if name in seen:
+            raise ValueError(f"namelist中有重复的名字: {name}")
+        seen.add(name)
+    if not isinstance(setting.get('points'), dict):
+        raise ValueError("Setting.yml中缺少points")
+    # 编译一次计分规则，检查rules和对应的分数项
+    StreakRules.from_setting(setting)
+    timer = setting.get('timer', {})
+    if not isinstance(timer, dict):
+        raise ValueError("Setting.yml中的timer格式不对")
+    for session in SESSIONS:
+        if session in timer:
+            try:
+                parse_clock(timer[session])
+            except ValueError:
+                raise ValueError(f"timer.{session}的时间格式不对: {timer[session]!r}，应为7:05这样的格式") from None
+    # 编译一次早到规则，检查arrival中的session和时间
+    try:
+        ArrivalCalendar.from_setting(setting)
+    except KeyError as e:
+        raise ValueError(f"arrival中的规则缺少{e}") from None
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"arrival中的规则有误: {e}") from None
+    return setting
+
+
+def parse_yaml(raw):
+    """尝试不同的编码解析YAML"""
+    import yaml
+
+    for encoding in ENCODINGS:
+        try:
+            return yaml.safe_load(raw.decode(encoding))
+        except (UnicodeDecodeError, yaml.YAMLError):
+            continue
+
+    # 如果所有编码都失败，使用错误处理方式读取
+    try:
+        return yaml.safe_load(raw.decode('utf-8', errors='replace'))
+    except yaml.YAMLError as e:
+        raise ValueError(f"Setting.yml格式错误: {e}")
+
+
+def dump_yaml(setting, path):
+    import yaml
+
+    with open(path, 'w', encoding='utf-8') as fp:
+        yaml.dump(setting, fp, allow_unicode=True)
+
+
+def _encode(value):
+    """把设置转换为可以写入JSON的结构：日期写成ISO字符串，键不是字符串的字典写成键值对列表"""
+    if isinstance(value, dict):
+        if all(isinstance(key, str) and not key.startswith('$') for key in value):
+            return {key: _encode(item) for key, item in value.items()}
+        return {'$pairs': [[_encode(key), _encode(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    raise TypeError(f"设置中有无法缓存的值: {value!r}")
+
+
+def _decode(obj):
+    if '$date' in obj:
+        return date.fromisoformat(obj['$date'])
+    if '$datetime' in obj:
+        return datetime.fromisoformat(obj['$datetime'])
+    if '$pairs' in obj:
+        return {key: value for key, value in obj['$pairs']}
+    return obj
+
+
+def _read_cache(cache_file):
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = json.loads(f.read(), object_hook=_decode)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return None
+    return cache
+
+
+def _write_cache(cache_file, stat, digest, setting):
+    try:
+        atomic_write_json(cache_file, {
+            'version': CACHE_VERSION,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': digest,
+            'setting': _encode(setting),
+        }, separators=(',', ':'))
+    except (OSError, TypeError):
+        # 缓存只是加速，写不进去也不影响使用
+        pass
+
+
+def load_settings(settings_file, cache_file):
+    """读取Setting.yml，优先使用缓存"""
+    stat = settings_file.stat()
+    cache = _read_cache(cache_file)
+    if cache and (cache['mtime_ns'], cache['size']) == (stat.st_mtime_ns, stat.st_size):
+        return cache['setting']
+
+    import hashlib
+
+    with open(settings_file, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cache and cache['sha256'] == digest:
+        setting = cache['setting']
+    else:
+        setting = validate_settings(parse_yaml(raw))
+    _write_cache(cache_file, stat, digest, setting)
+    return setting
+
+
+def diff_settings(old, new):
+    """比较两份设置，返回有变化的顶层项"""
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+
+class SettingsWatcher:
+    """轮询Setting.yml的修改时间和大小"""
+
+    def __init__(self, settings_file):
+        self.settings_file = settings_file
+        self.stamp = self._stat()
+
+    def _stat(self):
+        try:
+            stat = self.settings_file.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def changed(self):
+        """自上次检查以来文件是否有变化"""
+        stamp = self._stat()
+        if stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        return True
@@ -0,0 +1,171 @@
+"""定长二进制的学生数据快照：eggs/{session}_data.bin
+
+文件结构（小端）：
+    文件头    magic、版本、学生数、每条记录的字节数、history最多的天数
+    名单表    按ID排序的(学生ID, 记录序号)，二分查找
+    记录      每个学生一条：连续天数、current_day、max_days、history天数、history位图
+
+用mmap打开后可以直接读取任意一个学生的记录，不需要解析其他学生；
+内容与{session}_data.json的version 2格式一一对应，可以互相转换。
+
+用法：
+    python snapshot.py to-bin eggs/morning_data.json eggs/morning_data.bin
+    python snapshot.py to-json eggs/morning_data.bin eggs/morning_data.json
+"""
+import argparse
+import json
+import mmap
+import struct
+
+from common import atomic_open
+
+MAGIC = b'EBSN'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIHH')    # magic, 版本, 保留, 学生数, 记录字节数, history最多的天数
+TABLE_ENTRY = struct.Struct('<II')    # 学生ID, 记录序号
+RECORD_HEAD = struct.Struct('<IIHH')  # 连续天数, current_day, max_days, history天数
+
+
+def _record_size(history_days):
+    return RECORD_HEAD.size + (history_days + 7) // 8
+
+
+def write_snapshot(path, students):
+    """students为{学生ID: to_dict()的结果}，先写临时文件再替换"""
+    history_days = max((len(data.get('history', ())) for data in students.values()), default=0)
+    record_size = _record_size(history_days)
+    buf = bytearray(HEADER.size + len(students) * (TABLE_ENTRY.size + record_size))
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, 0, len(students), record_size, history_days)
+
+    table = HEADER.size
+    records = table + len(students) * TABLE_ENTRY.size
+    # 记录保持原来的顺序，名单表按ID排序
+    sids = [int(sid) for sid in students]
+    for pos, i in enumerate(sorted(range(len(sids)), key=sids.__getitem__)):
+        TABLE_ENTRY.pack_into(buf, table + pos * TABLE_ENTRY.size, sids[i], i)
+    for i, data in enumerate(students.values()):
+        offset = records + i * record_size
+        history = data.get('history', [])
+        scoring = data.get('scoring') or [0]
+        RECORD_HEAD.pack_into(buf, offset, scoring[-1], data.get('current_day', 0),
+                              data.get('max_days', 7), len(history))
+        bits = 0
+        for day, arrived in enumerate(history):
+            if arrived:
+                bits |= 1 << day
+        nbytes = record_size - RECORD_HEAD.size
+        buf[offset + RECORD_HEAD.size:offset + record_size] = bits.to_bytes(nbytes, 'little')
+
+    with atomic_open(path, 'wb') as f:
+        f.write(buf)
+
+
+class SnapshotReader:
+    """用mmap打开快照，按需读取单个学生；用完后close()或使用with"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, self.count, self.record_size, self.history_days = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是有效的学生数据快照: {path}")
+            self.records = HEADER.size + self.count * TABLE_ENTRY.size
+            if len(self.map) < self.records + self.count * self.record_size:
+                raise ValueError(f"学生数据快照不完整: {path}")
+        except (ValueError, struct.error):
+            self.map.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.map.close()
+
+    def __len__(self):
+        return self.count
+
+    def find(self, sid):
+        """学生ID对应的记录序号，不存在时返回None"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key, index = TABLE_ENTRY.unpack_from(self.map, HEADER.size + mid * TABLE_ENTRY.size)
+            if key == sid:
+                return index
+            if key < sid:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def sids(self):
+        """按记录顺序排列的学生ID"""
+        sids = [0] * self.count
+        for key, index in TABLE_ENTRY.iter_unpack(self.map[HEADER.size:self.records]):
+            sids[index] = key
+        return sids
+
+    def streak(self, index):
+        """只读取连续天数"""
+        return RECORD_HEAD.unpack_from(self.map, self.records + index * self.record_size)[0]
+
+    def history(self, index):
+        """只读取history"""
+        offset = self.records + index * self.record_size
+        days = RECORD_HEAD.unpack_from(self.map, offset)[3]
+        bits = int.from_bytes(self.map[offset + RECORD_HEAD.size:offset + self.record_size], 'little')
+        return [bool(bits >> day & 1) for day in range(days)]
+
+    def record(self, index):
+        """第index条记录，格式与ContinuousScoring.to_dict()相同"""
+        streak, current_day, max_days, _ = RECORD_HEAD.unpack_from(self.map, self.records + index * self.record_size)
+        return {
+            'scoring': [streak],
+            'history': self.history(index),
+            'max_days': max_days,
+            'current_day': current_day,
+        }
+
+    def items(self):
+        """按保存时的顺序产出(学生ID, 记录)"""
+        for index, sid in enumerate(self.sids()):
+            yield sid, self.record(index)
+
+
+def json_to_snapshot(json_path, bin_path):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data.get('version'), int):
+        raise ValueError("旧版以姓名为键的文件请先运行一次程序转换为以ID为键的格式")
+    write_snapshot(bin_path, {int(sid): student for sid, student in data['students'].items()})
+
+
+def snapshot_to_json(bin_path, json_path):
+    with SnapshotReader(bin_path) as reader:
+        students = {str(sid): record for sid, record in reader.items()}
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 2, 'students': students}, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="学生数据的JSON与二进制快照互相转换")
+    parser.add_argument('command', choices=['to-bin', 'to-json'])
+    parser.add_argument('source', type=Path)
+    parser.add_argument('target', type=Path)
+    args = parser.parse_args(argv)
+    if args.command == 'to-bin':
+        json_to_snapshot(args.source, args.target)
+    else:
+        snapshot_to_json(args.source, args.target)
+    print(args.target)
+
+
+if __name__ == "__main__":
+    main()
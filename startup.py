@@ -0,0 +1,43 @@
+"""启动耗时统计
+
+设置环境变量EARLY_BIRD_STARTUP=1，或运行python main.py --startup-times，
+会在标准错误输出各个启动阶段的耗时；未开启时mark()只做一次判断。
+"""
+import atexit
+import os
+import sys
+import time
+
+enabled = bool(os.environ.get('EARLY_BIRD_STARTUP')) or '--startup-times' in sys.argv
+started = time.perf_counter()
+phases = []  # (阶段, 耗时)
+_last = started
+_reported = False
+
+
+def mark(phase):
+    """记录从上一个阶段结束到现在的耗时"""
+    global _last
+    if not enabled:
+        return
+    now = time.perf_counter()
+    phases.append((phase, now - _last))
+    _last = now
+
+
+def report(file=None):
+    """输出各阶段耗时，只输出一次"""
+    global _reported
+    if not enabled or _reported:
+        return
+    _reported = True
+    file = file or sys.stderr
+    print("启动耗时:", file=file)
+    for phase, seconds in phases:
+        print(f"  {phase:<16} {seconds * 1000:8.2f} ms", file=file)
+    print(f"  {'合计':<16} {(_last - started) * 1000:8.2f} ms", file=file)
+
+
+if enabled:
+    # 命令行工具没有显式调用report()时，退出前输出
+    atexit.register(report)
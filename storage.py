@@ -0,0 +1,443 @@
+"""存储后端：JSON文件（默认）、二进制快照、追加日志和SQLite，学生数据统一以ID为键
+
+用法（在迁移后把Setting.yml中的storage.mode改成目标方式）：
+    python storage.py migrate sqlite
+"""
+import argparse
+import json
+from datetime import date
+
+from common import SESSIONS, atomic_write_json
+from journal import AttendanceJournal
+from snapshot import SnapshotReader, write_snapshot
+
+
+class StorageBackend:
+    """存储后端基类
+
+    子类至少实现load_students/save_students；record和reset的默认实现是
+    读出整个session、修改后再整体写回。暂存（断点）默认每个session一个文件
+    eggs/breakpoint_{session}.json，先写临时文件再替换；旧版的eggs/breakpoint.json仍可读取。
+    """
+
+    name = None
+    on_io = None  # 性能统计开启时为metrics.Metrics.count_bytes
+
+    def __init__(self, eggs_dir, index, namelist, scoring_cls):
+        self.eggs_dir = eggs_dir
+        self.index = index
+        self.namelist = namelist
+        self.scoring_cls = scoring_cls
+        self.breakpoint_file = eggs_dir/'breakpoint.json'  # 旧版共用的暂存文件
+
+    def new_students(self):
+        """按名单创建空白数据"""
+        return {self.index.intern(name): self.scoring_cls() for name in self.namelist}
+
+    def initial_students(self, session):
+        """新后端第一次使用时的数据：有JSON文件就从中迁移，否则按名单创建"""
+        if (self.eggs_dir/f'{session}_data.json').exists():
+            return JsonBackend(self.eggs_dir, self.index, self.namelist, self.scoring_cls).load_students(session)
+        return self.new_students()
+
+    def load_students(self, session):
+        raise NotImplementedError
+
+    def save_students(self, session, students):
+        raise NotImplementedError
+
+    def load_student(self, session, sid):
+        """读取单个学生的数据，不存在时返回None"""
+        return self.load_students(session).get(sid)
+
+    def record(self, session, present_ids, day=None):
+        """记录一天的考勤，返回更新后的{ID: ContinuousScoring}"""
+        students = self.load_students(session)
+        for sid, student in students.items():
+            student.record_attendance(sid in present_ids)
+        self.save_students(session, students)
+        return students
+
+    def reset(self):
+        """重置所有学生的数据，开始新的一周"""
+        for session in SESSIONS:
+            students = self.load_students(session)
+            for student in students.values():
+                student.reset_data()
+            self.save_students(session, students)
+
+    def update_roster(self, added, retired):
+        """名单变化时为新学生创建空白数据，并删除已移出名单的学生"""
+        for session in SESSIONS:
+            students = self.load_students(session)
+            for sid in added:
+                students.setdefault(sid, self.scoring_cls())
+            for sid in retired:
+                students.pop(sid, None)
+            self.save_students(session, students)
+
+    def attendance_rate(self, sid, session, start, end):
+        """某个学生在[start, end]之间的出勤率，没有记录时返回None"""
+        raise NotImplementedError(f"{self.name}存储方式不保存考勤日期，无法按日期查询")
+
+    def _breakpoint_path(self, session):
+        return self.eggs_dir/f'breakpoint_{session}.json'
+
+    def _read_breakpoint(self, session):
+        path = self._breakpoint_path(session)
+        if not path.exists():
+            # 旧版所有session共用eggs/breakpoint.json
+            path = self.breakpoint_file
+            if not path.exists():
+                return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self._count_io('read', path)
+        return data
+
+    def load_breakpoint(self, session):
+        """读取暂存的到场学生（ID，旧版文件中可能是姓名）"""
+        return self._read_breakpoint(session).get(session, [])
+
+    def breakpoint_day(self, session):
+        """暂存所属的考勤日期，旧版文件没有日期，返回None"""
+        day = self._read_breakpoint(session).get('date')
+        return date.fromisoformat(day) if day else None
+
+    def save_breakpoint(self, session, present_ids, day=None):
+        """保存暂存的到场学生ID和考勤日期（默认今天），只重写这个session的文件"""
+        path = self._breakpoint_path(session)
+        atomic_write_json(path, {session: sorted(present_ids), 'date': (day or date.today()).isoformat()},
+                          indent=2)
+        self._count_io('written', path)
+        self._drop_legacy_breakpoint(session)
+
+    def clear_breakpoint(self, session):
+        """清除指定session的暂存"""
+        path = self._breakpoint_path(session)
+        if path.exists():
+            path.unlink()
+        self._drop_legacy_breakpoint(session)
+
+    def _drop_legacy_breakpoint(self, session):
+        """从旧版共用文件中去掉这个session，避免之后又读到旧的暂存"""
+        if not self.breakpoint_file.exists():
+            return
+        with open(self.breakpoint_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if session not in data:
+            return
+        del data[session]
+        # 如果还有其他session的数据，保存；否则删除文件
+        if data:
+            atomic_write_json(self.breakpoint_file, data, indent=2)
+        else:
+            self.breakpoint_file.unlink()
+
+    def set_io_counter(self, callback):
+        """callback(direction, n)统计读写的字节数，direction为read或written"""
+        self.on_io = callback
+
+    def _count_io(self, direction, path):
+        if self.on_io is not None:
+            self.on_io(direction, path.stat().st_size)
+
+    def _count_io_bytes(self, direction, n):
+        if self.on_io is not None:
+            self.on_io(direction, n)
+
+    def close(self):
+        pass
+
+
+class JsonBackend(StorageBackend):
+    """eggs/{session}_data.json，每次保存重写整个文件"""
+
+    name = 'json'
+
+    def load_students(self, session):
+        data_file = self.eggs_dir/f'{session}_data.json'
+
+        if data_file.exists():
+            with open(data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._count_io('read', data_file)
+
+            # 从字典恢复ContinuousScoring对象
+            students = {}
+            if isinstance(data.get('version'), int):
+                for sid, student_data in data['students'].items():
+                    students[int(sid)] = self.scoring_cls.from_dict(student_data)
+            else:
+                # 旧版文件以姓名为键
+                for name, student_data in data.items():
+                    students[self.index.intern(name)] = self.scoring_cls.from_dict(student_data)
+                self.index.save()
+
+            return students
+        else:
+            # 创建新的学生数据
+            students = self.new_students()
+            self.save_students(session, students)
+            return students
+
+    def save_students(self, session, students):
+        data_file = self.eggs_dir/f'{session}_data.json'
+
+        # 转换为可序列化的字典
+        data = {}
+        for sid, student in students.items():
+            data[str(sid)] = student.to_dict()
+
+        atomic_write_json(data_file, {'version': 2, 'students': data}, indent=2)
+        self._count_io('written', data_file)
+
+
+class BinaryBackend(StorageBackend):
+    """eggs/{session}_data.bin，定长二进制快照（见snapshot.py）
+
+    读取单个学生时用mmap直接定位到他的记录，不需要读出整个名单。
+    """
+
+    name = 'binary'
+
+    def _data_file(self, session):
+        return self.eggs_dir/f'{session}_data.bin'
+
+    def load_students(self, session):
+        data_file = self._data_file(session)
+        if not data_file.exists():
+            students = self.initial_students(session)
+            self.save_students(session, students)
+            return students
+        with SnapshotReader(data_file) as reader:
+            students = {sid: self.scoring_cls.from_dict(record) for sid, record in reader.items()}
+        self._count_io('read', data_file)
+        return students
+
+    def load_student(self, session, sid):
+        data_file = self._data_file(session)
+        if not data_file.exists():
+            return super().load_student(session, sid)
+        with SnapshotReader(data_file) as reader:
+            index = reader.find(sid)
+            if index is not None:
+                self._count_io_bytes('read', reader.record_size)
+                return self.scoring_cls.from_dict(reader.record(index))
+        return None
+
+    def save_students(self, session, students):
+        data_file = self._data_file(session)
+        write_snapshot(data_file, {sid: student.to_dict() for sid, student in students.items()})
+        self._count_io('written', data_file)
+
+
+class JournalBackend(StorageBackend):
+    """追加日志，见journal.AttendanceJournal"""
+
+    name = 'journal'
+
+    def __init__(self, eggs_dir, index, namelist, scoring_cls, snapshot_every=50):
+        super().__init__(eggs_dir, index, namelist, scoring_cls)
+        self.journal = AttendanceJournal(eggs_dir, scoring_cls, self.initial_students,
+                                         index.intern, snapshot_every)
+
+    def set_io_counter(self, callback):
+        super().set_io_counter(callback)
+        self.journal.on_io = callback
+
+    def load_students(self, session):
+        return self.journal.students(session)
+
+    def save_students(self, session, students):
+        self.journal.replace(session, students)
+
+    def record(self, session, present_ids, day=None):
+        # 只追加一条记录
+        return self.journal.record(session, present_ids, day)
+
+    def reset(self):
+        self.journal.reset()
+
+
+class SqliteBackend(StorageBackend):
+    """SQLite存储（WAL模式）
+
+    students表保存每个学生的当前状态，attendance表按(学生, session, 日期)
+    保存每天的考勤，用于按日期范围查询，每周重置时不会清空；
+    暂存也保存在数据库中。
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS students (
+        session TEXT NOT NULL,
+        sid INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        PRIMARY KEY (session, sid)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS attendance (
+        sid INTEGER NOT NULL,
+        session TEXT NOT NULL,
+        day TEXT NOT NULL,
+        arrived INTEGER NOT NULL,
+        PRIMARY KEY (sid, session, day)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS attendance_by_day ON attendance (session, day);
+    CREATE TABLE IF NOT EXISTS breakpoint (
+        session TEXT NOT NULL,
+        sid INTEGER NOT NULL,
+        PRIMARY KEY (session, sid)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS breakpoint_day (
+        session TEXT PRIMARY KEY,
+        day TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, eggs_dir, index, namelist, scoring_cls, path=None):
+        super().__init__(eggs_dir, index, namelist, scoring_cls)
+        import sqlite3
+
+        self.path = path or eggs_dir/'attendance.db'
+        # 签到服务在工作线程中串行访问数据库
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def _dump(self, student):
+        return json.dumps(student.to_dict(), separators=(',', ':'))
+
+    def load_students(self, session):
+        rows = self.conn.execute(
+            "SELECT sid, state FROM students WHERE session = ?", (session,)).fetchall()
+        if not rows:
+            students = self.initial_students(session)
+            self.save_students(session, students)
+            return students
+        return {sid: self.scoring_cls.from_dict(json.loads(state)) for sid, state in rows}
+
+    def load_student(self, session, sid):
+        row = self.conn.execute(
+            "SELECT state FROM students WHERE session = ? AND sid = ?", (session, sid)).fetchone()
+        return self.scoring_cls.from_dict(json.loads(row[0])) if row else None
+
+    def save_students(self, session, students):
+        with self.conn:
+            self.conn.execute("DELETE FROM students WHERE session = ?", (session,))
+            self.conn.executemany(
+                "INSERT INTO students (session, sid, state) VALUES (?, ?, ?)",
+                ((session, sid, self._dump(student)) for sid, student in students.items()))
+
+    def record(self, session, present_ids, day=None):
+        day = (day or date.today()).isoformat()
+        students = self.load_students(session)
+        for sid, student in students.items():
+            student.record_attendance(sid in present_ids)
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE students SET state = ? WHERE session = ? AND sid = ?",
+                ((self._dump(student), session, sid) for sid, student in students.items()))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO attendance (sid, session, day, arrived) VALUES (?, ?, ?, ?)",
+                ((sid, session, day, int(sid in present_ids)) for sid in students))
+        return students
+
+    def update_roster(self, added, retired):
+        # 只插入和删除变化的行
+        for session in SESSIONS:
+            if self.conn.execute("SELECT 1 FROM students WHERE session = ? LIMIT 1", (session,)).fetchone() is None:
+                self.load_students(session)  # 第一次使用时先建立数据
+        empty = self._dump(self.scoring_cls())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO students (session, sid, state) VALUES (?, ?, ?)",
+                ((session, sid, empty) for session in SESSIONS for sid in added))
+            self.conn.executemany(
+                "DELETE FROM students WHERE session = ? AND sid = ?",
+                ((session, sid) for session in SESSIONS for sid in retired))
+
+    def attendance_rate(self, sid, session, start, end):
+        count, arrived = self.conn.execute(
+            "SELECT COUNT(*), SUM(arrived) FROM attendance "
+            "WHERE sid = ? AND session = ? AND day BETWEEN ? AND ?",
+            (sid, session, start.isoformat(), end.isoformat())).fetchone()
+        return arrived / count if count else None
+
+    def load_breakpoint(self, session):
+        return [sid for (sid,) in self.conn.execute(
+            "SELECT sid FROM breakpoint WHERE session = ? ORDER BY sid", (session,))]
+
+    def breakpoint_day(self, session):
+        row = self.conn.execute("SELECT day FROM breakpoint_day WHERE session = ?", (session,)).fetchone()
+        return date.fromisoformat(row[0]) if row else None
+
+    def save_breakpoint(self, session, present_ids, day=None):
+        with self.conn:
+            self.conn.execute("DELETE FROM breakpoint WHERE session = ?", (session,))
+            self.conn.executemany(
+                "INSERT INTO breakpoint (session, sid) VALUES (?, ?)",
+                ((session, sid) for sid in present_ids))
+            self.conn.execute("INSERT OR REPLACE INTO breakpoint_day (session, day) VALUES (?, ?)",
+                              (session, (day or date.today()).isoformat()))
+
+    def clear_breakpoint(self, session):
+        with self.conn:
+            self.conn.execute("DELETE FROM breakpoint WHERE session = ?", (session,))
+            self.conn.execute("DELETE FROM breakpoint_day WHERE session = ?", (session,))
+
+    def close(self):
+        self.conn.close()
+
+
+def open_backend(mode, eggs_dir, index, namelist, scoring_cls, options=None):
+    """按storage.mode打开存储后端"""
+    options = options or {}
+    if mode == 'json':
+        return JsonBackend(eggs_dir, index, namelist, scoring_cls)
+    if mode == 'binary':
+        return BinaryBackend(eggs_dir, index, namelist, scoring_cls)
+    if mode == 'journal':
+        return JournalBackend(eggs_dir, index, namelist, scoring_cls, options.get('snapshot_every', 50))
+    if mode == 'sqlite':
+        path = options.get('sqlite_path')
+        return SqliteBackend(eggs_dir, index, namelist, scoring_cls, path and eggs_dir.parent/path)
+    raise ValueError(f"未知的存储方式: {mode}")
+
+
+def migrate(source, target):
+    """把学生数据和暂存从一个后端整体复制到另一个后端"""
+    for session in SESSIONS:
+        target.save_students(session, source.load_students(session))
+        # 旧版暂存文件中保存的是姓名
+        present = [p if isinstance(p, int) else source.index.id_of(p)
+                   for p in source.load_breakpoint(session)]
+        present = [sid for sid in present if sid is not None]
+        if present:
+            target.save_breakpoint(session, present, source.breakpoint_day(session))
+        else:
+            target.clear_breakpoint(session)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="存储后端工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = sub.add_parser('migrate', help="把当前存储方式的数据迁移到另一种方式")
+    migrate_parser.add_argument('target', choices=['json', 'binary', 'journal', 'sqlite'])
+    args = parser.parse_args(argv)
+
+    from core import AttendanceSystem
+
+    system = AttendanceSystem()
+    if system.storage.name == args.target:
+        parser.error(f"当前已经是{args.target}存储")
+    target = system.open_storage(args.target)
+    migrate(system.storage, target)
+    target.close()
+    print(f"已从{system.storage.name}迁移到{args.target}，请把Setting.yml中的storage.mode改为{args.target}")
+
+
+if __name__ == "__main__":
+    main()
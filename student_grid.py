@@ -0,0 +1,139 @@
+"""大名单考勤窗口：只绘制可见行的虚拟复选框网格，支持按名字搜索"""
+import tkinter as tk
+import tkinter.font as tkfont
+
+
+class VirtualStudentGrid:
+    """虚拟化的学生复选框网格
+
+    勾选状态保存在bytearray中，画布上只保留可见行所需的图元，
+    滚动时复用这些图元重新绘制，名单再长窗口也能立即打开。
+    """
+
+    def __init__(self, parent, names, columns, font, checked=(), on_change=None):
+        self.names = list(names)
+        self.on_change = on_change  # 勾选变化时调用，用于自动暂存
+        self.columns = max(1, columns)
+        self.state = bytearray(len(self.names))
+        index = {name: i for i, name in enumerate(self.names)}
+        for name in checked:
+            if name in index:
+                self.state[index[name]] = 1
+        self.visible = list(range(len(self.names)))  # 当前筛选结果
+        self.query = ''
+        self.pool = []  # 复用的画布图元：(方框, 勾, 名字)
+        self.font = font
+
+        measure = tkfont.Font(parent, font=font)
+        self.row_height = measure.metrics('linespace') + 8
+        longest = max((measure.measure(name) for name in self.names), default=40)
+        self.cell_width = longest + self.row_height + 16
+
+        self.frame = tk.Frame(parent)
+        search_bar = tk.Frame(self.frame)
+        search_bar.pack(fill='x', pady=(0, 5))
+        tk.Label(search_bar, text="搜索:", font=font).pack(side='left')
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.filter(self.search_var.get()))
+        tk.Entry(search_bar, textvariable=self.search_var, font=font).pack(side='left', fill='x', expand=True)
+        self.count_label = tk.Label(search_bar, font=font)
+        self.count_label.pack(side='left', padx=5)
+
+        self.canvas = tk.Canvas(self.frame, width=self.cell_width * self.columns,
+                                height=self.row_height * 15, highlightthickness=0)
+        scrollbar = tk.Scrollbar(self.frame, orient='vertical', command=self.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.canvas.bind('<MouseWheel>', self.on_wheel)
+        self.canvas.bind('<Button-4>', lambda event: self.yview('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda event: self.yview('scroll', 1, 'units'))
+        self.update_scrollregion()
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def selected(self):
+        """获取所有被勾选的学生"""
+        return [name for name, flag in zip(self.names, self.state) if flag]
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.redraw()
+
+    def on_wheel(self, event):
+        self.yview('scroll', -1 if event.delta > 0 else 1, 'units')
+
+    def update_scrollregion(self):
+        rows = -(-len(self.visible) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.cell_width * self.columns, rows * self.row_height),
+                              yscrollincrement=self.row_height)
+        self.count_label.config(text=f"{len(self.visible)}/{len(self.names)}")
+
+    def filter(self, query):
+        """按名字筛选；新关键字包含旧关键字时只在当前结果里继续筛选"""
+        query = query.strip().lower()
+        if query.startswith(self.query):
+            candidates = self.visible
+        else:
+            candidates = range(len(self.names))
+        names = self.names
+        self.visible = [i for i in candidates if query in names[i].lower()]
+        self.query = query
+        self.update_scrollregion()
+        self.canvas.yview_moveto(0)
+        self.redraw()
+
+    def cell_at(self, x, y):
+        """画布坐标对应的学生下标，空白处返回None"""
+        col = int(x // self.cell_width)
+        row = int(y // self.row_height)
+        if col >= self.columns or col < 0 or row < 0:
+            return None
+        pos = row * self.columns + col
+        return self.visible[pos] if pos < len(self.visible) else None
+
+    def on_click(self, event):
+        i = self.cell_at(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        if i is not None:
+            self.state[i] ^= 1
+            self.redraw()
+            if self.on_change is not None:
+                self.on_change()
+
+    def redraw(self):
+        """只绘制可见的行，图元不够时补充，多余的隐藏"""
+        canvas = self.canvas
+        height = canvas.winfo_height() or int(canvas.cget('height'))
+        top = canvas.canvasy(0)
+        first_row = int(top // self.row_height)
+        last_row = int((top + height) // self.row_height)
+        start = first_row * self.columns
+        cells = self.visible[start:(last_row + 1) * self.columns]
+
+        while len(self.pool) < len(cells):
+            self.pool.append((
+                canvas.create_rectangle(0, 0, 0, 0),
+                canvas.create_rectangle(0, 0, 0, 0, fill='black'),
+                canvas.create_text(0, 0, anchor='w', font=self.font),
+            ))
+
+        box_size = self.row_height - 10
+        for offset, (box, mark, label) in enumerate(self.pool):
+            if offset >= len(cells):
+                for item in (box, mark, label):
+                    canvas.itemconfigure(item, state='hidden')
+                continue
+            i = cells[offset]
+            pos = start + offset
+            x = (pos % self.columns) * self.cell_width + 5
+            y = (pos // self.columns) * self.row_height + 5
+            canvas.coords(box, x, y, x + box_size, y + box_size)
+            canvas.coords(mark, x + 3, y + 3, x + box_size - 3, y + box_size - 3)
+            canvas.coords(label, x + box_size + 6, y + box_size / 2)
+            canvas.itemconfigure(box, state='normal')
+            canvas.itemconfigure(mark, state='normal' if self.state[i] else 'hidden')
+            canvas.itemconfigure(label, state='normal', text=self.names[i])
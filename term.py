@@ -0,0 +1,263 @@
+"""整学期考勤历史：每个学生每个session每天1位，并预先计算前缀和
+
+eggs/term/{session}.bits 是只追加的二进制文件，每条记录为
+<日期序数 u32><位图字节数 u32><位图>，第sid位表示ID为sid的学生当天早到。
+同一天再次记录时追加新记录，读取时以最后一条为准。
+
+出勤天数、出勤率在任意日期范围内都是O(1)；最长连续天数按学生
+按需建立分块索引，之后的查询同样是O(1)。
+"""
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from roster import _indices_to_mask
+
+HEADER = struct.Struct('<II')
+BLOCK = 16  # 最长连续天数索引的分块大小
+
+
+def _mask_to_counts(prev, mask, n):
+    """在上一天的前缀和上加上当天的位图，得到新的前缀和"""
+    row = array('H', prev)
+    if len(row) < n:
+        row.extend([0] * (n - len(row)))
+    if mask:
+        bits = bin(mask)[2:][::-1]
+        for sid, bit in enumerate(bits):
+            if bit == '1':
+                row[sid] += 1
+    return row
+
+
+class StreakIndex:
+    """单个学生的最长连续天数索引"""
+
+    def __init__(self, bits):
+        n = len(bits)
+        self.runs = runs = array('H', [0] * n)       # 以第d天结尾的连续天数
+        self.next_absent = nxt = array('I', [n] * (n + 1))  # 第d天及之后第一个缺勤日
+        run = 0
+        for d, bit in enumerate(bits):
+            run = run + 1 if bit else 0
+            runs[d] = run
+        for d in range(n - 1, -1, -1):
+            nxt[d] = nxt[d + 1] if bits[d] else d
+
+        # 块内前缀/后缀最大值，以及块最大值的稀疏表
+        self.prefix_max = array('H', runs)
+        self.suffix_max = array('H', runs)
+        for d in range(n):
+            if d % BLOCK and self.prefix_max[d - 1] > self.prefix_max[d]:
+                self.prefix_max[d] = self.prefix_max[d - 1]
+        for d in range(n - 2, -1, -1):
+            if (d + 1) % BLOCK and self.suffix_max[d + 1] > self.suffix_max[d]:
+                self.suffix_max[d] = self.suffix_max[d + 1]
+        blocks = [max(runs[i:i + BLOCK]) for i in range(0, n, BLOCK)]
+        self.sparse = [blocks]
+        width = 1
+        while width * 2 <= len(blocks):
+            prev = self.sparse[-1]
+            self.sparse.append([max(prev[i], prev[i + width]) for i in range(len(prev) - width)])
+            width *= 2
+
+    def max_run(self, lo, hi):
+        """runs[lo..hi]的最大值"""
+        if lo > hi:
+            return 0
+        bl, bh = lo // BLOCK, hi // BLOCK
+        if bl == bh:
+            return max(self.runs[lo:hi + 1])
+        best = max(self.suffix_max[lo], self.prefix_max[hi])
+        if bh - bl > 1:
+            a, b = bl + 1, bh - 1
+            level = (b - a + 1).bit_length() - 1
+            table = self.sparse[level]
+            best = max(best, table[a], table[b - (1 << level) + 1])
+        return best
+
+    def longest(self, lo, hi):
+        """第lo到hi天（含）之间最长的连续天数"""
+        if lo > hi:
+            return 0
+        # 第一段可能在lo之前就开始了，要截断到lo
+        first_absent = self.next_absent[lo]
+        head = min(first_absent, hi + 1) - lo
+        return max(head, self.max_run(first_absent, hi))
+
+
+class TermReader:
+    """用mmap只读打开整学期记录，不加载位图，按需读取单个学生某一天的一位
+
+    打开时只扫描记录头，保存每天最后一条记录的位置，内存只与天数有关。
+    """
+
+    def __init__(self, path):
+        self.map = None
+        self.days = []                # 日期序数，升序
+        self.offsets = array('Q')     # 每天位图在文件中的位置
+        self.sizes = array('I')       # 每天位图的字节数
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        records = {}
+        pos = 0
+        while pos + HEADER.size <= size:
+            ordinal, nbytes = HEADER.unpack_from(self.map, pos)
+            if pos + HEADER.size + nbytes > size:
+                break  # 写到一半的尾部记录，只读时直接忽略
+            records[ordinal] = pos + HEADER.size, nbytes
+            pos += HEADER.size + nbytes
+        for ordinal in sorted(records):
+            self.days.append(ordinal)
+            self.offsets.append(records[ordinal][0])
+            self.sizes.append(records[ordinal][1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def arrived(self, d, sid):
+        """ID为sid的学生第d天是否早到"""
+        byte = sid >> 3
+        if byte >= self.sizes[d]:
+            return False
+        return bool(self.map[self.offsets[d] + byte] >> (sid & 7) & 1)
+
+
+class TermHistory:
+    """某个session的整学期考勤"""
+
+    def __init__(self, path):
+        self.path = path
+        self.days = []      # 日期序数，升序
+        self.rows = []      # 每天的位图
+        self.prefix = []    # 每天的前缀和array('H')，下标为学生ID
+        self.streaks = {}   # 学生ID -> StreakIndex，按需建立
+        # 按记录顺序的日期序数，重复记录和补录也各占一项，与每个学生增量记录中的各天一一对应
+        self.recorded = array('I')
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        records = {}
+        good_end = 0
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        pos = 0
+        while pos + HEADER.size <= len(data):
+            ordinal, nbytes = HEADER.unpack_from(data, pos)
+            end = pos + HEADER.size + nbytes
+            if end > len(data):
+                break
+            records[ordinal] = int.from_bytes(data[pos + HEADER.size:end], 'little')
+            self.recorded.append(ordinal)
+            pos = good_end = end
+        if good_end < len(data):
+            # 写到一半的尾部记录
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_end)
+
+        for ordinal in sorted(records):
+            self._push(ordinal, records[ordinal])
+
+    def _push(self, ordinal, mask):
+        prev = self.prefix[-1] if self.prefix else array('H')
+        self.days.append(ordinal)
+        self.rows.append(mask)
+        self.prefix.append(_mask_to_counts(prev, mask, mask.bit_length()))
+
+    def append(self, day, present_ids):
+        """记录一天的考勤；同一天重复记录时覆盖，补录以前的日期时从该天起重算前缀和"""
+        present_ids = list(present_ids)
+        mask = _indices_to_mask(present_ids, max(present_ids, default=-1) + 1)
+        ordinal = day.toordinal()
+
+        payload = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.write(HEADER.pack(ordinal, len(payload)) + payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.recorded.append(ordinal)
+        self.streaks.clear()
+        if not self.days or ordinal > self.days[-1]:
+            self._push(ordinal, mask)
+            return
+        # 覆盖或补录：截掉该天及之后的部分再依次加回
+        i = bisect_left(self.days, ordinal)
+        tail = list(zip(self.days[i:], self.rows[i:]))
+        if tail[0][0] == ordinal:
+            tail[0] = (ordinal, mask)
+        else:
+            tail.insert(0, (ordinal, mask))
+        del self.days[i:], self.rows[i:], self.prefix[i:]
+        for ordinal, mask in tail:
+            self._push(ordinal, mask)
+
+    def clear(self):
+        """删除整学期记录，用于从头重新导入"""
+        if self.path.exists():
+            self.path.unlink()
+        self.days.clear()
+        self.rows.clear()
+        self.prefix.clear()
+        self.streaks.clear()
+        del self.recorded[:]
+
+    def span(self, start=None, end=None):
+        """日期范围对应的下标区间[lo, hi]"""
+        lo = bisect_left(self.days, start.toordinal()) if start else 0
+        hi = bisect_right(self.days, end.toordinal()) - 1 if end else len(self.days) - 1
+        return lo, hi
+
+    def _count(self, sid, d):
+        """第0到d天的出勤天数"""
+        if d < 0:
+            return 0
+        row = self.prefix[d]
+        return row[sid] if sid < len(row) else 0
+
+    def total(self, sid, start=None, end=None):
+        """日期范围内的早到天数"""
+        lo, hi = self.span(start, end)
+        if lo > hi:
+            return 0
+        return self._count(sid, hi) - self._count(sid, lo - 1)
+
+    def rate(self, sid, start=None, end=None):
+        """日期范围内的出勤率，范围内没有记录时返回None"""
+        lo, hi = self.span(start, end)
+        if lo > hi:
+            return None
+        return (self._count(sid, hi) - self._count(sid, lo - 1)) / (hi - lo + 1)
+
+    def longest_streak(self, sid, start=None, end=None):
+        """日期范围内最长的连续早到天数"""
+        lo, hi = self.span(start, end)
+        index = self.streaks.get(sid)
+        if index is None:
+            bit = 1 << sid
+            index = self.streaks[sid] = StreakIndex([bool(row & bit) for row in self.rows])
+        return index.longest(lo, hi)
+
+    def nbytes(self):
+        """位图和前缀和占用的大致内存"""
+        bits = sum((row.bit_length() + 7) // 8 for row in self.rows)
+        return bits + sum(row.itemsize * len(row) for row in self.prefix)
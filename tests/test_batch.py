@@ -0,0 +1,52 @@
+"""批量导入：格式错误的行被跳过，出错时不留下写了一半的数据"""
+import json
+from datetime import date
+
+import pytest
+
+from batch import BatchStats, import_events, read_events
+from core import AttendanceSystem
+
+
+def test_read_csv_skips_bad_rows(tmp_path):
+    path = tmp_path/'events.csv'
+    path.write_text("date,session,name\n"
+                    "2026-03-02, morning , 学生1 \n"
+                    "2026-03-02,evening,学生2\n"
+                    "2026-03-02\n"
+                    "3月2日,morning,学生3\n"
+                    "2026-03-03T07:01:00,afternoon,学生4\n", encoding='utf-8')
+    stats = BatchStats()
+    events = list(read_events(path, stats=stats))
+    assert events == [(date(2026, 3, 2), 'morning', '学生1'), (date(2026, 3, 3), 'afternoon', '学生4')]
+    assert (stats.rows, stats.skipped) == (6, 4)
+
+
+def test_read_jsonl_skips_bad_rows(tmp_path):
+    rows = [
+        {'date': '2026-03-02', 'session': 'morning', 'name': '学生1'},
+        {'date': '2026-03-02', 'session': 'morning', 'name': 3},
+        {'date': '2026-03-02', 'session': None, 'name': '学生2'},
+        {'date': 20260302, 'session': 'morning', 'name': '学生2'},
+        {'session': 'morning', 'name': '学生2'},
+        ['2026-03-02', 'morning', '学生2'],
+        'morning',
+    ]
+    path = tmp_path/'events.jsonl'
+    path.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n{不是JSON\n\n",
+                    encoding='utf-8')
+    stats = BatchStats()
+    assert list(read_events(path, stats=stats)) == [(date(2026, 3, 2), 'morning', '学生1')]
+    assert (stats.rows, stats.skipped) == (8, 7)
+
+
+def test_unsorted_import_writes_nothing(tmp_path):
+    system = AttendanceSystem(tmp_path)
+    path = tmp_path/'events.csv'
+    path.write_text("2026-03-02,morning,学生1\n2026-03-10,morning,学生1\n2026-03-03,morning,学生1\n",
+                    encoding='utf-8')
+    before = sorted(p.relative_to(tmp_path) for p in tmp_path.rglob('*'))
+    with pytest.raises(ValueError):
+        import_events(path, system, weekly_reports=True)
+    # 第二周的周报本来会在发现顺序错误之前写出
+    assert sorted(p.relative_to(tmp_path) for p in tmp_path.rglob('*')) == before
@@ -0,0 +1,57 @@
+"""日志式存储：重放、写到一半的尾部记录和快照"""
+import random
+
+from core import ContinuousScoring
+from journal import AttendanceJournal
+
+IDS = range(20)
+
+
+def open_journal(eggs_dir, snapshot_every=1000):
+    seed = lambda session: {sid: ContinuousScoring() for sid in IDS}
+    return AttendanceJournal(eggs_dir, ContinuousScoring, seed, int, snapshot_every)
+
+
+def dump(journal):
+    return {session: {sid: student.to_dict() for sid, student in journal.state[session].items()}
+            for session in ("morning", "afternoon")}
+
+
+def fill(journal, rng, days):
+    for _ in range(days):
+        for session in ("morning", "afternoon"):
+            journal.record(session, {sid for sid in IDS if rng.random() < 0.7})
+        if rng.random() < 0.1:
+            journal.reset()
+
+
+def test_replay_restores_state(tmp_path):
+    journal = open_journal(tmp_path)
+    fill(journal, random.Random(1), 15)
+    assert dump(open_journal(tmp_path)) == dump(journal)
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    journal = open_journal(tmp_path)
+    fill(journal, random.Random(2), 10)
+    expected = dump(journal)
+    size = journal.journal_file.stat().st_size
+
+    # 模拟追加到一半时断电
+    with open(journal.journal_file, 'ab') as f:
+        f.write(b'{"seq": 999, "op": "record", "session": "mor')
+    reopened = open_journal(tmp_path)
+    assert dump(reopened) == expected
+    assert journal.journal_file.stat().st_size == size
+
+    # 截断后可以继续追加
+    reopened.record("morning", {0, 1})
+    journal.record("morning", {0, 1})
+    assert dump(open_journal(tmp_path)) == dump(journal)
+
+
+def test_compaction_keeps_state(tmp_path):
+    journal = open_journal(tmp_path, snapshot_every=7)
+    fill(journal, random.Random(3), 25)
+    assert journal.pending < 7
+    assert dump(open_journal(tmp_path, snapshot_every=7)) == dump(journal)
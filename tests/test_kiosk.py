@@ -0,0 +1,51 @@
+"""签到服务：暂存按日期恢复，异常的请求得到错误回复"""
+import asyncio
+import json
+from datetime import date, timedelta
+
+from core import AttendanceSystem
+from kiosk import CheckinServer
+
+
+def test_restores_only_todays_breakpoint(tmp_path):
+    system = AttendanceSystem(tmp_path)
+    names = system.setting['namelist']
+    system.save_breakpoint('morning', names[:2], date.today() - timedelta(days=1))
+    system.save_breakpoint('afternoon', names[2:4])
+    server = CheckinServer(system)
+    # 昨天没有提交的签到不能算作今天的
+    assert (date.today(), 'morning') not in server.present
+    assert server.names_of((date.today(), 'afternoon')) == sorted(names[2:4])
+
+
+def test_overlong_and_bad_requests_get_replies(tmp_path):
+    system = AttendanceSystem(tmp_path)
+
+    async def run():
+        server = CheckinServer(system, port=0)
+        await server.start()
+        port = server.server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'[1, 2]\n{"op": "stats"}\n')
+            first = json.loads(await reader.readline())
+            second = json.loads(await reader.readline())
+            writer.close()
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'{"name": "' + b'x' * (1 << 17) + b'"}\n')
+            long = json.loads(await reader.readline())
+            try:
+                closed = await reader.readline()
+            except ConnectionResetError:
+                closed = b''  # 服务端断开时还有没读的数据
+            writer.close()
+        finally:
+            await server.close()
+        return first, second, long, closed
+
+    first, second, long, closed = asyncio.run(run())
+    assert first['ok'] is False
+    assert second['ok'] is True
+    assert long == {'ok': False, 'error': "请求过长"}
+    assert closed == b''
@@ -0,0 +1,24 @@
+"""性能统计：提交考勤时存储后端的读写也要计时"""
+import re
+from datetime import date
+
+from core import AttendanceSystem
+
+
+def test_submit_times_storage(tmp_path, monkeypatch):
+    monkeypatch.setenv('EARLY_BIRD_METRICS', '1')
+    system = AttendanceSystem(tmp_path)
+    system.record_attendance('morning', system.setting['namelist'][:2], date(2026, 3, 2))
+    system.metrics.export()
+    text = (tmp_path/'reports'/'metrics.prom').read_text(encoding='utf-8')
+
+    def sample(metric, op):
+        match = re.search(rf'_op_seconds_{metric}{{op="{re.escape(op)}"}} ([\d.]+)', text)
+        return float(match.group(1)) if match else 0
+
+    assert sample('count', 'record_attendance') == 1
+    # JSON后端的record先读出整个文件再整体写回，两者都要计时
+    for op in ('storage.record', 'storage.load_students', 'storage.save_students'):
+        assert sample('count', op) >= 1
+        assert sample('sum', op) > 0
+    assert re.search(r'io_bytes_total{direction="written"} [1-9]', text)
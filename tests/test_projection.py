@@ -0,0 +1,56 @@
+"""预测本周分数：小名单上按手算的期望值和分位数"""
+import shutil
+from datetime import date, timedelta
+from pathlib import Path
+from statistics import NormalDist
+
+import pytest
+
+from core import AttendanceSystem
+from projection import project_week
+
+MONDAY = date(2026, 3, 2)
+SETTINGS = Path(__file__).resolve().parent.parent/'bacon'/'Setting.yml'
+
+
+@pytest.fixture
+def system(tmp_path):
+    # 仓库自带的设置：名单只有4个人，默认计分规则
+    (tmp_path/'bacon').mkdir()
+    shutil.copyfile(SETTINGS, tmp_path/'bacon'/'Setting.yml')
+    system = AttendanceSystem(tmp_path)
+    assert system.setting['namelist'] == ['sweet', 'sleepy', 'stupid', 'sexy']
+    attended = {'sweet': [1, 1, 1, 1], 'stupid': [1, 0, 1, 1]}
+    for d in range(4):
+        present = [name for name, bits in attended.items() if bits[d]]
+        for session in ("morning", "afternoon"):
+            system.record_attendance(session, present, MONDAY + timedelta(days=d))
+    return system
+
+
+def test_project_one_day(system):
+    result = project_week(system, today=MONDAY + timedelta(days=4), days=1)
+    assert result['days'] == {'morning': 1, 'afternoon': 1}
+    students = result['students']
+    # 已经连续4天，最后一天到不到都是1分，两个session共2分
+    assert students['sweet'] == {'current': 2, 'expected': pytest.approx(2), 'p10': 2, 'p50': 2, 'p90': 2}
+    assert students['sleepy'] == {'current': 0, 'expected': pytest.approx(0), 'p10': 0, 'p50': 0, 'p90': 0}
+    # 连续2天，到场概率(3+1)/(4+2)=2/3，到了才凑满3天
+    assert students['stupid'] == {'current': 0, 'expected': pytest.approx(4 / 3), 'p10': 0, 'p50': 1, 'p90': 2}
+    group = result['class']
+    assert group['current'] == 2
+    assert group['expected'] == pytest.approx(10 / 3)
+    # 只有stupid的分数不确定：两个session各是p=2/3的0/1分，方差为2*(2/3)*(1/3)
+    normal = NormalDist(10 / 3, (4 / 9) ** 0.5)
+    for q in (10, 50, 90):
+        assert group[f'p{q}'] == pytest.approx(normal.inv_cdf(q / 100))
+
+
+def test_project_until_sunday(system):
+    result = project_week(system, today=MONDAY + timedelta(days=4))
+    # 星期五、六、日
+    assert result['days'] == {'morning': 3, 'afternoon': 3}
+    sweet = result['students']['sweet']
+    # 到了7天才是2.5分，概率为(5/6)**3
+    assert sweet['expected'] == pytest.approx(2 * (1 + 1.5 * (5 / 6) ** 3))
+    assert (sweet['p10'], sweet['p90']) == (2, 5)
@@ -0,0 +1,115 @@
+"""计分规则与逐段数连续出勤的参考实现对比"""
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+
+from core import AttendanceSystem, ContinuousScoring
+from rules import StreakRules
+
+
+def reference(rules, bits, weekend=None):
+    """直接按定义计算：取最近window天，按周末规则整理后逐段计分"""
+    bits = list(bits)[-rules.window:]
+    if weekend is not None and rules.weekends != 'count':
+        weekend = ([False] * len(bits) + list(weekend))[-len(bits):]
+        if rules.weekends == 'skip':
+            bits = [b for b, w in zip(bits, weekend) if not w]
+        else:
+            bits = [b for b, w in zip(bits, weekend) if b or not w]
+    runs, run = [], 0
+    for bit in bits + [False]:
+        if bit:
+            run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+    counts = [0] * len(rules.tiers)
+    for length in runs:
+        matched = [(k, low, repeat) for k, (_, low, high, repeat) in enumerate(rules.tiers)
+                   if low <= length and (high is None or length <= high)]
+        if rules.mode == 'highest' and matched:
+            matched = [max(matched, key=lambda m: m[1])]
+        for k, low, repeat in matched:
+            counts[k] += length // low if repeat else 1
+    return tuple(counts)
+
+
+def random_rules(rng):
+    tiers = []
+    for i in range(rng.randint(1, 3)):
+        low = rng.randint(1, 7)
+        high = rng.choice([None, low, low + rng.randint(0, 5)])
+        tiers.append({'points': f'p{i}', 'min': low, 'max': high, 'repeat': rng.random() < 0.3})
+    return StreakRules(tiers, rng.choice(['highest', 'all']), rng.randint(1, 14),
+                       rng.choice(['count', 'skip', 'extend']))
+
+
+def test_default_rules_match_continuous_scoring():
+    rules = StreakRules()
+    assert rules.is_default()
+    rng = random.Random(1)
+    for _ in range(1000):
+        student = ContinuousScoring()
+        for _ in range(rng.randint(0, 20)):
+            student.record_attendance(rng.random() < 0.75)
+        assert rules.evaluate(student.history) == student.calculate_scores()
+
+
+def test_evaluate_matches_reference():
+    rng = random.Random(2)
+    for _ in range(500):
+        rules = random_rules(rng)
+        for _ in range(10):
+            n = rng.randint(0, 14)
+            bits = [rng.random() < 0.7 for _ in range(n)]
+            weekend = [rng.random() < 0.3 for _ in range(n)]
+            assert rules.evaluate(bits, weekend) == reference(rules, bits, weekend)
+            assert rules.evaluate(bits) == reference(rules, bits)
+
+
+def test_evaluate_roster_matches_reference():
+    rng = random.Random(3)
+    for _ in range(200):
+        rules = random_rules(rng)
+        n = rng.randint(0, 40)
+        days = rng.randint(0, 14)
+        students = [[rng.random() < 0.7 for _ in range(days)] for _ in range(n)]
+        rows = [sum(1 << i for i in range(n) if students[i][d]) for d in range(days)]
+        weekend = [rng.random() < 0.3 for _ in range(days)]
+        window = rows[-rules.window:]
+        counts = rules.evaluate_roster(window, n, weekend[-len(window):] if window else [])
+        assert counts == [reference(rules, bits, weekend) for bits in students]
+
+
+@pytest.mark.parametrize('config', [
+    {'mode': 'best'},
+    {'weekends': 'sometimes'},
+    {'window': 15},
+    {'tiers': []},
+    {'tiers': [{'points': '_3_days', 'min': 5, 'max': 3}]},
+])
+def test_invalid_rules(config):
+    with pytest.raises(ValueError):
+        StreakRules.from_setting({'rules': config, 'points': {'_3_days': 1, '_7_days': 3}})
+
+
+def test_resubmitted_day_keeps_weekends_aligned(tmp_path):
+    (tmp_path/'bacon').mkdir()
+    text = (Path(__file__).resolve().parent.parent/'bacon'/'Setting.yml').read_text(encoding='utf-8')
+    assert 'weekends: count' in text
+    (tmp_path/'bacon'/'Setting.yml').write_text(text.replace('weekends: count', 'weekends: skip'),
+                                                encoding='utf-8')
+    system = AttendanceSystem(tmp_path)
+    monday = date(2026, 3, 2)
+    # 星期一到星期五，星期五重新提交一次，再记录星期六
+    days = [monday + timedelta(days=d) for d in (0, 1, 2, 3, 4, 4, 5)]
+    for day in days:
+        scores = system.record_attendance('morning', ['sweet'], day)
+    expected = [day.weekday() >= 5 for day in days]
+    assert system.recent_weekends('morning', 7) == expected
+    student = system.load_student_data('morning')['sweet']
+    assert scores['sweet'] == system.rules.evaluate(student.history, expected)
+    # 重新打开后从文件读出的记录顺序相同
+    assert AttendanceSystem(tmp_path).recent_weekends('morning', 7) == expected
@@ -0,0 +1,89 @@
+"""增量计分与完整重算、整班矩阵与逐个学生计算的一致性"""
+import random
+from datetime import date, timedelta
+
+from core import AttendanceSystem, ContinuousScoring
+from roster import RosterMatrix
+
+
+def random_student(rng, days):
+    student = ContinuousScoring()
+    for _ in range(days):
+        if rng.random() < 0.05:
+            student.reset_data()
+        student.record_attendance(rng.random() < 0.75)
+    return student
+
+
+def test_incremental_matches_recompute():
+    rng = random.Random(1)
+    for _ in range(2000):
+        student = random_student(rng, rng.randint(0, 40))
+        assert student.check_consistency()
+        assert student.calculate_scores() == student.recompute_scores()
+        # 读回后重建的计数器也一致
+        restored = ContinuousScoring.from_dict(student.to_dict())
+        assert restored.calculate_scores() == student.calculate_scores()
+        assert restored.check_consistency()
+
+
+def test_streak_and_total():
+    rng = random.Random(2)
+    for _ in range(500):
+        bits = [rng.random() < 0.7 for _ in range(rng.randint(0, 30))]
+        student = ContinuousScoring()
+        for bit in bits:
+            student.record_attendance(bit)
+        streak = 0
+        for bit in bits:
+            streak = streak + 1 if bit else 0
+        assert student.get_current_streak() == streak
+        assert student.get_total_attendance() == sum(bits[-14:])
+
+
+def test_roster_matrix_matches_students():
+    rng = random.Random(3)
+    for _ in range(300):
+        names = [f"学生{i}" for i in range(rng.randint(0, 80))]
+        students = {name: random_student(rng, rng.randint(0, 20)) for name in names if rng.random() < 0.9}
+        roster = RosterMatrix.from_students(students, names)
+        scores = roster.calculate_scores()
+        streaks = roster.current_streaks()
+        for name, student in students.items():
+            assert scores[name] == student.calculate_scores()
+            assert streaks[name] == student.get_current_streak()
+            # 历史记录按最近一天右对齐，前面补缺勤
+            history = roster.history_of(name)
+            assert history[len(history) - len(student.history):] == list(student.history)
+
+
+def test_roster_record_matches_students():
+    rng = random.Random(4)
+    names = [f"学生{i}" for i in range(150)]
+    roster = RosterMatrix(names)
+    students = {name: ContinuousScoring() for name in names}
+    for _ in range(30):
+        present = [name for name in names if rng.random() < 0.8]
+        roster.record_day(present + ["不在名单里"])
+        for name, student in students.items():
+            student.record_attendance(name in present)
+        scores = roster.calculate_scores()
+        assert all(scores[name] == student.calculate_scores() for name, student in students.items())
+    for name, history, streak in roster.iter_students():
+        assert history == list(students[name].history)
+        assert streak == students[name].get_current_streak()
+
+
+def test_verify_scores_after_recording(tmp_path):
+    system = AttendanceSystem(tmp_path)
+    names = system.setting['namelist']
+    rng = random.Random(5)
+    for i in range(20):
+        for session in ("morning", "afternoon"):
+            system.record_attendance(session, [n for n in names if rng.random() < 0.7],
+                                     date(2026, 3, 2) + timedelta(days=i))
+    for session in ("morning", "afternoon"):
+        assert system.verify_scores(session) == []
+        # 默认规则直接用增量计数器，与整班矩阵的结果相同
+        scores, _ = system.session_scores(session)
+        assert scores == system.load_roster(session).calculate_scores()
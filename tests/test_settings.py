@@ -0,0 +1,48 @@
+"""设置的校验与缓存"""
+import pickle
+import shutil
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from settings import load_settings, parse_yaml, validate_settings
+
+SETTINGS = Path(__file__).resolve().parent.parent/'bacon'/'Setting.yml'
+
+
+@pytest.fixture
+def settings_file(tmp_path):
+    path = tmp_path/'Setting.yml'
+    shutil.copyfile(SETTINGS, path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("terms:\n  2026春: [2026-02-16, 2026-07-10]\n")
+    return path
+
+
+def test_cache_round_trip(settings_file, tmp_path):
+    cache = tmp_path/'settings.cache'
+    parsed = load_settings(settings_file, cache)
+    assert parsed['terms']['2026春'] == [date(2026, 2, 16), date(2026, 7, 10)]
+    # 第二次读取来自缓存，与直接解析YAML完全相同
+    assert load_settings(settings_file, cache) == parsed
+    assert cache.read_bytes().startswith(b'{')
+
+
+def test_pickle_cache_is_ignored(settings_file, tmp_path):
+    cache = tmp_path/'settings.cache'
+    cache.write_bytes(pickle.dumps({'version': 3, 'setting': {}}))
+    assert load_settings(settings_file, cache)['namelist']
+
+
+@pytest.mark.parametrize('old, new', [
+    ('morning: "7:05"', 'morning: "7.05"'),
+    ('afternoon: "14:00"', 'afternoon: "25:00"'),
+    ('- session: afternoon', '- session: evening'),
+    ('time: "7:50"', 'tme: "7:50"'),
+])
+def test_invalid_timer_and_arrival(old, new):
+    text = SETTINGS.read_text(encoding='utf-8')
+    assert old in text
+    with pytest.raises(ValueError):
+        validate_settings(parse_yaml(text.replace(old, new).encode('utf-8')))
@@ -0,0 +1,95 @@
+"""存储后端：读写往返一致，写到一半出错不破坏已有的数据"""
+import random
+from datetime import date
+
+import pytest
+
+from common import SESSIONS
+from core import AttendanceSystem, ContinuousScoring
+from storage import migrate
+
+
+class Unserializable:
+    def to_dict(self):
+        return {'history': [object()]}
+
+
+def test_json_save_is_atomic(tmp_path):
+    system = AttendanceSystem(tmp_path)
+    storage = system.open_storage('json')
+    students = storage.load_students('morning')
+    path = tmp_path/'eggs'/'morning_data.json'
+    before = path.read_bytes()
+    broken = dict(students)
+    broken[max(students) + 1] = Unserializable()
+    with pytest.raises(TypeError):
+        storage.save_students('morning', broken)
+    assert path.read_bytes() == before
+    assert not path.with_name(path.name + '.tmp').exists()
+
+
+def random_students(system, rng, days):
+    students = {}
+    for name in system.setting['namelist']:
+        student = ContinuousScoring()
+        for _ in range(rng.randint(0, days)):
+            student.record_attendance(rng.random() < 0.7)
+        students[system.index.id_of(name)] = student
+    return students
+
+
+def dump(students):
+    return {sid: student.to_dict() for sid, student in students.items()}
+
+
+@pytest.mark.parametrize('mode', ['json', 'binary', 'journal', 'sqlite'])
+def test_backend_round_trip(tmp_path, mode):
+    system = AttendanceSystem(tmp_path)
+    rng = random.Random(mode)
+    storage = system.open_storage(mode)
+    expected = {session: random_students(system, rng, 20) for session in SESSIONS}
+    for session in SESSIONS:
+        storage.save_students(session, expected[session])
+    sids = sorted(expected['morning'])
+    present = set(sids[::2])
+    expected['morning'] = storage.record('morning', present, date(2026, 3, 2))
+    storage.save_breakpoint('afternoon', sids[:3], date(2026, 3, 3))
+    storage.close()
+
+    # 重新打开后读到的数据相同
+    storage = system.open_storage(mode)
+    for session in SESSIONS:
+        assert dump(storage.load_students(session)) == dump(expected[session])
+        for sid in sids[:3]:
+            assert storage.load_student(session, sid).to_dict() == expected[session][sid].to_dict()
+    assert [student.history[-1] for sid, student in sorted(expected['morning'].items())] == \
+        [sid in present for sid in sids]
+    assert sorted(storage.load_breakpoint('afternoon')) == sids[:3]
+    assert storage.breakpoint_day('afternoon') == date(2026, 3, 3)
+    storage.clear_breakpoint('afternoon')
+    assert storage.load_breakpoint('afternoon') == []
+
+    storage.reset()
+    storage.close()
+    storage = system.open_storage(mode)
+    for session in SESSIONS:
+        assert all(not student.history and student.streak == 0
+                   for student in storage.load_students(session).values())
+    storage.close()
+
+
+@pytest.mark.parametrize('mode', ['binary', 'journal', 'sqlite'])
+def test_migrate_from_json(tmp_path, mode):
+    system = AttendanceSystem(tmp_path)
+    source = system.open_storage('json')
+    expected = {session: random_students(system, random.Random(1), 20) for session in SESSIONS}
+    for session in SESSIONS:
+        source.save_students(session, expected[session])
+    source.save_breakpoint('morning', [1, 2], date(2026, 3, 2))
+    target = system.open_storage(mode)
+    migrate(source, target)
+    for session in SESSIONS:
+        assert dump(target.load_students(session)) == dump(expected[session])
+    assert sorted(target.load_breakpoint('morning')) == [1, 2]
+    assert target.breakpoint_day('morning') == date(2026, 3, 2)
+    target.close()
@@ -0,0 +1,65 @@
+"""整学期记录：区间查询与逐天暴力计算对比"""
+import random
+from datetime import date, timedelta
+
+from term import TermHistory, TermReader
+
+N = 40
+
+
+def brute(days, present, sid, start, end):
+    bits = [sid in present[day] for day in days if start <= day <= end]
+    longest = run = 0
+    for bit in bits:
+        run = run + 1 if bit else 0
+        longest = max(longest, run)
+    return sum(bits), (sum(bits) / len(bits) if bits else None), longest
+
+
+def build(path, rng, n_days):
+    first = date(2026, 2, 23)
+    days = [first + timedelta(days=i) for i in range(n_days)]
+    present = {day: {sid for sid in range(N) if rng.random() < 0.7} for day in days}
+    term = TermHistory(path)
+    # 乱序补录，并重复记录一部分日期
+    order = days[:]
+    rng.shuffle(order)
+    for day in order + rng.sample(days, n_days // 5):
+        if rng.random() < 0.3:
+            term.append(day, set(range(N)) - present[day])  # 先记错，随后覆盖
+        term.append(day, present[day])
+    return days, present, term
+
+
+def test_range_queries_match_brute_force(tmp_path):
+    rng = random.Random(1)
+    days, present, term = build(tmp_path/'morning.bits', rng, 60)
+    assert term.days == [day.toordinal() for day in days]
+    for _ in range(300):
+        start, end = sorted(rng.sample(days, 2))
+        sid = rng.randrange(N + 2)  # 包括没有记录过的ID
+        total, rate, longest = brute(days, present, sid, start, end)
+        assert term.total(sid, start, end) == total
+        assert term.rate(sid, start, end) == rate
+        assert term.longest_streak(sid, start, end) == longest
+
+
+def test_reload_and_reader_match(tmp_path):
+    path = tmp_path/'afternoon.bits'
+    days, present, term = build(path, random.Random(2), 30)
+    reloaded = TermHistory(path)
+    assert reloaded.days == term.days and reloaded.rows == term.rows
+    with TermReader(path) as reader:
+        assert reader.days == term.days
+        for d, day in enumerate(days):
+            assert [reader.arrived(d, sid) for sid in range(N + 2)] == [sid in present[day] for sid in range(N + 2)]
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    path = tmp_path/'morning.bits'
+    days, present, term = build(path, random.Random(3), 10)
+    size = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    assert TermHistory(path).rows == term.rows
+    assert path.stat().st_size == size
@@ -0,0 +1,231 @@
+"""每周快照与月/学期排行榜
+
+每次生成周报时把本周每个学生的3天/7天次数和分数保存到
+eggs/weeks/{年}-W{周}.json，排行榜由eggs/weeks/aggregate.json中的
+累计值直接给出，不需要重放每天的考勤。更正某一周时只减去旧快照、
+加上新快照；快照文件被手动修改时，只重算受影响的月份和学期。
+
+用法：
+    python weekly.py leaderboard --month 2026-03
+    python weekly.py leaderboard --term 2026春 --top 20
+    python weekly.py correct 2026-W10
+    python weekly.py sync
+"""
+import argparse
+import json
+from datetime import date, timedelta
+
+from common import atomic_write_json
+
+
+def week_key(day):
+    """日期所在的ISO周，例如2026-W10"""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_range(key):
+    """ISO周的星期一和星期天"""
+    year, week = key.split('-W')
+    monday = date.fromisocalendar(int(year), int(week), 1)
+    return monday, monday + timedelta(days=6)
+
+
+def term_of(day, terms=None):
+    """日期所在的学期；设置中没有terms时2~7月为春季学期，8~1月为秋季学期"""
+    for name, (start, end) in (terms or {}).items():
+        if str(start) <= day.isoformat() <= str(end):
+            return name
+    if 2 <= day.month <= 7:
+        return f"{day.year}春"
+    return f"{day.year if day.month >= 8 else day.year - 1}秋"
+
+
+def periods_of(key, terms=None):
+    """一周计入的月份和学期，按该周星期四所在的月份（与ISO周的归属规则一致）"""
+    thursday = week_range(key)[0] + timedelta(days=3)
+    return [f"month:{thursday:%Y-%m}", f"term:{term_of(thursday, terms)}"]
+
+
+# 没有tiers的快照是按原来的3天/7天规则保存的
+DEFAULT_TIERS = ['_3_days', '_7_days']
+
+
+def make_snapshot(key, points, tiers, scores):
+    """tiers是计分规则各档的分数项，scores为{学生ID: (上午各档次数, 下午各档次数)}
+
+    每个学生保存为[上午各档次数..., 下午各档次数..., 分数]
+    """
+    start, end = week_range(key)
+    students = {}
+    for sid, (morning, afternoon) in scores.items():
+        total = sum((m + a) * points[tier] for m, a, tier in zip(morning, afternoon, tiers))
+        students[str(sid)] = [*morning, *afternoon, total]
+    return {
+        'version': 1,
+        'week': key,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'tiers': list(tiers),
+        'points': {tier: points[tier] for tier in tiers},
+        'students': students,
+    }
+
+
+class WeeklyLedger:
+    """周快照和按月/学期的累计排行"""
+
+    def __init__(self, weeks_dir, terms=None):
+        self.dir = weeks_dir
+        self.terms = terms or {}
+        self.aggregate_file = weeks_dir/'aggregate.json'
+        self.weeks = {}    # 周 -> {'periods': [...], 'mtime_ns': ..., 'size': ...}
+        self.periods = {}  # 'month:2026-03' / 'term:2026春' -> {学生ID: {'points': 分数, 分数项: 次数}}
+        if self.aggregate_file.exists():
+            with open(self.aggregate_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == 2:
+                self.weeks = data.get('weeks', {})
+                self.periods = {period: {int(sid): row for sid, row in rows.items()}
+                                for period, rows in data.get('periods', {}).items()}
+            else:
+                # 旧格式的累计值直接从快照重算
+                self.rebuild()
+
+    def week_file(self, key):
+        return self.dir/f'{key}.json'
+
+    def load_week(self, key):
+        """读取某周的快照，不存在时返回None"""
+        path = self.week_file(key)
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _apply(self, snapshot, periods, sign):
+        tiers = snapshot.get('tiers', DEFAULT_TIERS)
+        n = len(tiers)
+        for period in periods:
+            rows = self.periods.setdefault(period, {})
+            for sid, values in snapshot['students'].items():
+                row = rows.setdefault(int(sid), {'points': 0})
+                row['points'] += sign * values[-1]
+                for k, tier in enumerate(tiers):
+                    row[tier] = row.get(tier, 0) + sign * (values[k] + values[n + k])
+
+    def _stamp(self, key, periods):
+        stat = self.week_file(key).stat()
+        self.weeks[key] = {'periods': periods, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+    def save_week(self, snapshot):
+        """保存（或更正）一周的快照，累计值只做增量调整"""
+        key = snapshot['week']
+        self.dir.mkdir(parents=True, exist_ok=True)
+        old = self.load_week(key) if key in self.weeks else None
+        atomic_write_json(self.week_file(key), snapshot, separators=(',', ':'))
+
+        if old is not None:
+            self._apply(old, self.weeks[key]['periods'], -1)
+        periods = periods_of(key, self.terms)
+        self._apply(snapshot, periods, 1)
+        self._stamp(key, periods)
+        self.save()
+
+    def sync(self):
+        """检查快照文件是否被手动修改、增加或删除，只重算受影响的月份和学期"""
+        on_disk = {path.stem for path in self.dir.glob('*-W*.json')} if self.dir.exists() else set()
+        changed = set()
+        for key in on_disk | set(self.weeks):
+            meta = self.weeks.get(key)
+            if key not in on_disk or meta is None:
+                changed.add(key)
+                continue
+            stat = self.week_file(key).stat()
+            if (stat.st_mtime_ns, stat.st_size) != (meta['mtime_ns'], meta['size']):
+                changed.add(key)
+        if not changed:
+            return set()
+
+        affected = set()
+        for key in changed:
+            if key in self.weeks:
+                affected.update(self.weeks.pop(key)['periods'])
+            if key in on_disk:
+                periods = periods_of(key, self.terms)
+                affected.update(periods)
+                self._stamp(key, periods)
+        self.rebuild(affected)
+        return affected
+
+    def rebuild(self, periods=None):
+        """从快照重算指定的（默认全部）月份和学期"""
+        if periods is None:
+            self.weeks = {}
+            for path in sorted(self.dir.glob('*-W*.json')):
+                self._stamp(path.stem, periods_of(path.stem, self.terms))
+            periods = {p for meta in self.weeks.values() for p in meta['periods']}
+            self.periods = {}
+        for period in periods:
+            self.periods.pop(period, None)
+        for key, meta in self.weeks.items():
+            wanted = [p for p in meta['periods'] if p in periods]
+            if wanted:
+                self._apply(self.load_week(key), wanted, 1)
+        self.save()
+
+    def save(self):
+        atomic_write_json(self.aggregate_file, {
+            'version': 2,
+            'weeks': self.weeks,
+            'periods': {period: {str(sid): row for sid, row in rows.items()}
+                        for period, rows in self.periods.items()},
+        }, separators=(',', ':'))
+
+    def leaderboard(self, period, top=None):
+        """某个月份或学期的排行，返回[(学生ID, 分数, {分数项: 次数})]，按分数从高到低"""
+        rows = self.periods.get(period, {})
+        ranking = sorted(rows.items(), key=lambda item: item[1]['points'], reverse=True)
+        if top:
+            ranking = ranking[:top]
+        return [(sid, row['points'], {tier: n for tier, n in row.items() if tier != 'points'})
+                for sid, row in ranking]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="周快照与月/学期排行榜")
+    sub = parser.add_subparsers(dest='command', required=True)
+    board = sub.add_parser('leaderboard', help="显示某个月份或学期的排行")
+    group = board.add_mutually_exclusive_group(required=True)
+    group.add_argument('--month', help="例如2026-03")
+    group.add_argument('--term', help="例如2026春")
+    board.add_argument('--top', type=int, help="只显示前N名")
+    correct = sub.add_parser('correct', help="用整学期记录重新计算某一周（例如补录之后）")
+    correct.add_argument('week', help="例如2026-W10")
+    sub.add_parser('sync', help="快照文件被手动修改后更新排行")
+    sub.add_parser('rebuild', help="从全部快照重算排行")
+    args = parser.parse_args(argv)
+
+    from core import AttendanceSystem
+
+    system = AttendanceSystem()
+    ledger = system.weekly_ledger()
+    if args.command == 'leaderboard':
+        period = f"month:{args.month}" if args.month else f"term:{args.term}"
+        labels = {key: system.rules.label(k) for k, key in enumerate(system.rules.keys)}
+        for rank, (sid, pts, counts) in enumerate(ledger.leaderboard(period, args.top), 1):
+            detail = ", ".join(f"{labels.get(tier, tier)}×{n}" for tier, n in counts.items())
+            print(f"{rank}\t{system.index.name_of(sid)}\t{pts}\t({detail})")
+    elif args.command == 'correct':
+        system.correct_week(args.week)
+        print(f"已更正{args.week}")
+    elif args.command == 'sync':
+        affected = ledger.sync()
+        print(f"已重算: {', '.join(sorted(affected))}" if affected else "没有变化")
+    else:
+        ledger.rebuild()
+        print("已重算全部排行")
+
+
+if __name__ == "__main__":
+    main()